@@ -0,0 +1,84 @@
+import os
+import json
+import struct
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+LIBRARY_HASH_INDEX_PATH = os.getenv("LIBRARY_HASH_INDEX_PATH", "/music/library_hashes.json")
+CHUNK_SIZE = 1024 * 1024
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def _is_id3v2_header(header):
+    return len(header) == 10 and header[:3] == b'ID3' and header[3] < 0xFF and all(b < 0x80 for b in header[6:10])
+
+def audio_bounds(f, size):
+    """(start, end) of the audio payload: leading ID3v2 tags and trailing ID3v1 / APEv2 / ID3v2 footer tags excluded"""
+    start = 0
+    while start < size:
+        f.seek(start)
+        header = f.read(10)
+        if not _is_id3v2_header(header):
+            break
+        # Footer flag adds a 10 byte footer after the tag
+        start += 10 + _syncsafe(header[6:10]) + (10 if header[5] & 0x10 else 0)
+
+    end = size
+    while end > start:
+        if end - start >= 128:
+            f.seek(end - 128)
+            if f.read(3) == b'TAG':
+                end -= 128
+                continue
+        if end - start >= 32:
+            f.seek(end - 32)
+            footer = f.read(32)
+            if footer[:8] == b'APETAGEX':
+                tag_size, flags = struct.unpack('<I', footer[12:16])[0], struct.unpack('<I', footer[20:24])[0]
+                # tag_size covers items + footer; the optional header is another 32 bytes
+                tag_end = end - tag_size - (32 if flags & 0x80000000 else 0)
+                if tag_end >= start:
+                    end = tag_end
+                    continue
+        if end - start >= 10:
+            f.seek(end - 10)
+            footer = f.read(10)
+            if footer[:3] == b'3DI' and all(b < 0x80 for b in footer[6:10]):
+                tag_end = end - 20 - _syncsafe(footer[6:10])
+                if tag_end >= start:
+                    end = tag_end
+                    continue
+        break
+    return start, end
+
+def hash_audio(filepath):
+    """Hash of the audio payload only, so retagged copies of the same file hash alike (None if there is no payload)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        start, end = audio_bounds(f, size)
+        if start >= end:
+            return None
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+def load_hash_index(path=LIBRARY_HASH_INDEX_PATH):
+    """{audio hash: library path} written by scan_library, empty if missing"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read hash index {path}: {e}")
+        return {}
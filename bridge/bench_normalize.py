@@ -0,0 +1,68 @@
+"""Micro-benchmark for the shared normalize module.
+
+Times normalize.py against the per-script implementations it replaced (kept below verbatim) on
+random strings. Their parity is checked by tests/test_normalize.py.
+
+Usage: python bench_normalize.py [--strings 20000] [--rounds 5]
+"""
+import re
+import time
+import random
+import argparse
+from unidecode import unidecode
+import normalize
+
+# --- Legacy implementations (reference only) ---
+
+def legacy_clean_string(text):
+    """scan_library.py version (the one the library index keys were built with)"""
+    if not text:
+        return ""
+    keywords = r"\bradio\b|\bedit\b|\bmix\b|\bremix\b|\bremaster\b|\bfeat\b|\bft\.?|\bfeature\b|\bextended\b|\bclub\b|\boriginal\b|\bvocal\b|\bversion\b"
+    pattern = r'\s*[(\[][^\x29\x5D]*?(?:' + keywords + r')[^\x29\x5D]*?[)\x5D]'
+    prev_text = None
+    while text != prev_text:
+        prev_text = text
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\s*-\s*.*?(?:' + keywords + r').*?$', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\s+(?:feat|ft\.|feature)\.?\s+.*$', '', text, flags=re.IGNORECASE)
+    return text.strip()
+
+def legacy_normalize_string(s):
+    s = re.sub(r'[^\w\s]', ' ', s.lower())
+    s = re.sub(r'\s+', ' ', s).strip()
+    return s
+
+# --- Corpus ---
+
+FUZZ_ALPHABET = ["(", ")", "[", "]", " ", "-", ".", "/", "radio", "Edit", "ft.", "ft", "feat", "Mix", "Version",
+                 "a", "Б", "é", "ё", "_", "'", "Love", "ночь", "\t", "Original", "club"]
+
+def fuzz_corpus(count, seed=1):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 12))) for _ in range(count)]
+
+def bench(label, func, corpus, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for text in corpus:
+            func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<44} {len(corpus) / best / 1000:8.1f} k strings/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--strings", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = fuzz_corpus(args.strings)
+
+    bench("legacy clean+normalize+unidecode (3 calls)",
+          lambda s: (legacy_clean_string(s), legacy_normalize_string(s), legacy_normalize_string(unidecode(s))),
+          corpus, args.rounds)
+    bench("normalize.forms()", normalize.forms, corpus, args.rounds)
+    bench("legacy normalize_string", legacy_normalize_string, corpus, args.rounds)
+    bench("normalize.normalize_string", normalize.normalize_string, corpus, args.rounds)
@@ -0,0 +1,80 @@
+import os
+import ntpath
+from collections import namedtuple
+from normalize import cached_forms
+
+# Score weights (points); a higher total is a better download source
+WEIGHT_FREE_SLOT = 30.0
+WEIGHT_QUEUE = 25.0
+WEIGHT_SPEED = 20.0
+WEIGHT_BITRATE = 10.0
+WEIGHT_SIZE = 10.0
+WEIGHT_MATCH = 25.0
+
+# Queue length at which the queue penalty is maxed out, upload speed (bytes/s) that earns full speed points
+QUEUE_PENALTY_CAP = int(os.getenv("RANK_QUEUE_PENALTY_CAP", "50"))
+FULL_SPEED_BYTES = int(os.getenv("RANK_FULL_SPEED_BYTES", str(1024 * 1024)))
+# Plausible size of a single MP3 track when the response carries no length
+MIN_TRACK_BYTES = 1024 * 1024
+MAX_TRACK_BYTES = 40 * 1024 * 1024
+
+Candidate = namedtuple('Candidate', ['score', 'username', 'filename', 'size', 'bitrate', 'queue_length', 'upload_speed'])
+
+def size_sanity(file):
+    """1.0 when the file size fits its bitrate and length (or a plausible track size), down to -1.0 when it clearly doesn't"""
+    size = file.get('size') or 0
+    if size < MIN_TRACK_BYTES or size > MAX_TRACK_BYTES:
+        return -1.0
+    length = file.get('length')
+    bitrate = file.get('bitRate')
+    if not length or not bitrate:
+        return 0.5
+    # Implied bitrate of the payload; tags and artwork make it a little higher than the stream bitrate
+    ratio = size * 8 / length / 1000 / bitrate
+    if 0.9 <= ratio <= 1.3:
+        return 1.0
+    if 0.75 <= ratio <= 2.0:
+        return 0.0
+    return -1.0
+
+def match_strength(filename, artist, title):
+    """Share of the file name (without folders and extension) taken by artist and title, 0..1"""
+    stem = os.path.splitext(ntpath.basename(filename))[0]
+    f, a, t = cached_forms(stem), cached_forms(artist), cached_forms(title)
+    for f_form, a_form, t_form in ((f.norm, a.norm, t.norm), (f.uni, a.uni, t.uni)):
+        if f_form and a_form in f_form and t_form in f_form:
+            return min(1.0, (len(a_form) + len(t_form) + 1) / len(f_form))
+    return 0.0
+
+def score_file(user_response, file, names):
+    score = WEIGHT_FREE_SLOT if user_response.get('hasFreeUploadSlot') else 0.0
+    queue_length = user_response.get('queueLength') or 0
+    score -= WEIGHT_QUEUE * min(queue_length, QUEUE_PENALTY_CAP) / QUEUE_PENALTY_CAP
+    score += WEIGHT_SPEED * min((user_response.get('uploadSpeed') or 0) / FULL_SPEED_BYTES, 1.0)
+    score += WEIGHT_BITRATE * min((file.get('bitRate') or 0) / 320, 1.0)
+    score += WEIGHT_SIZE * size_sanity(file)
+    score += WEIGHT_MATCH * max(match_strength(file['filename'], artist, title) for artist, title in names)
+    return score
+
+def rank_candidates(responses, names, accept):
+    """Score every file accept(file) lets through, best first.
+
+    `names` are the (artist, title) pairs of the track; match strength is the best over all of them.
+    Ties keep response order, so with equal peers the old "first match wins" pick is still first.
+    """
+    candidates = []
+    for user_response in responses:
+        for file in user_response.get('files', []):
+            if not accept(file):
+                continue
+            candidates.append(Candidate(
+                score=score_file(user_response, file, names),
+                username=user_response['username'],
+                filename=file['filename'],
+                size=file['size'],
+                bitrate=file.get('bitRate'),
+                queue_length=user_response.get('queueLength') or 0,
+                upload_speed=user_response.get('uploadSpeed') or 0,
+            ))
+    candidates.sort(key=lambda candidate: candidate.score, reverse=True)
+    return candidates
@@ -0,0 +1,66 @@
+from normalize import cached_forms
+
+class SubstringIndex:
+    """Finds which indexed needles can be substrings of a haystack without testing every needle.
+
+    A needle token without whitespace can only occur inside a single whitespace-separated token of
+    the haystack, so each needle is filed under its longest token and looked up through the substrings
+    of the haystack tokens. Lookups return a superset; confirm with `in`.
+    """
+
+    def __init__(self):
+        self.by_anchor = {}
+        self.anchor_lengths = set()
+        # Empty needles are contained in every haystack
+        self.always = set()
+
+    def add(self, position, needle):
+        tokens = needle.split()
+        if not tokens:
+            self.always.add(position)
+            return
+        anchor = max(tokens, key=len)
+        self.by_anchor.setdefault(anchor, set()).add(position)
+        self.anchor_lengths.add(len(anchor))
+
+    def candidates(self, haystack):
+        positions = set(self.always)
+        for token in set(haystack.split()):
+            for length in self.anchor_lengths:
+                for start in range(len(token) - length + 1):
+                    positions |= self.by_anchor.get(token[start:start + length], set())
+        return positions
+
+class ExpectedTracks:
+    """Expected tracks indexed for the two organize_daily_files checks; both return the first match in list order"""
+
+    def __init__(self, tracks):
+        self.tracks = list(tracks)
+        # Tag check: raw lowercase title inside the tag title
+        self.by_tag_title = SubstringIndex()
+        # Filename check (matches_track): normalized and transliterated title inside the file name
+        self.by_title = {'norm': SubstringIndex(), 'uni': SubstringIndex()}
+        for position, track in enumerate(self.tracks):
+            self.by_tag_title.add(position, track['title'].lower())
+            forms = cached_forms(track['title'])
+            self.by_title['norm'].add(position, forms.norm)
+            self.by_title['uni'].add(position, forms.uni)
+
+    def match_tags(self, artist, title):
+        """First track whose artist and title are contained in the tag values (case-insensitive)"""
+        artist, title = artist.lower(), title.lower()
+        for position in sorted(self.by_tag_title.candidates(title)):
+            track = self.tracks[position]
+            if track['artist'].lower() in artist and track['title'].lower() in title:
+                return track
+        return None
+
+    def match_filename(self, filename, matches_track):
+        """First track matches_track(filename, artist, title) accepts"""
+        f = cached_forms(filename)
+        positions = self.by_title['norm'].candidates(f.norm) | self.by_title['uni'].candidates(f.uni)
+        for position in sorted(positions):
+            track = self.tracks[position]
+            if matches_track(filename, track['artist'], track['title']):
+                return track
+        return None
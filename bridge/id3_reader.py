@@ -0,0 +1,135 @@
+import struct
+from mutagen.mp3 import MP3
+from mutagen.id3 import ID3
+
+# Largest text frame we are willing to read on the fast path
+MAX_TEXT_FRAME_SIZE = 64 * 1024
+
+TEXT_ENCODINGS = {
+    0: ('latin-1', b'\x00'),
+    1: ('utf-16', b'\x00\x00'),
+    2: ('utf-16-be', b'\x00\x00'),
+    3: ('utf-8', b'\x00'),
+}
+
+class FastPathError(Exception):
+    """Tag layout not handled by the header-only reader, use the full parser"""
+
+def _syncsafe(data):
+    if any(b & 0x80 for b in data):
+        raise FastPathError("not a syncsafe integer")
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def _valid_frame_id(frame_id):
+    return len(frame_id) == 4 and all(48 <= b <= 57 or 65 <= b <= 90 for b in frame_id)
+
+def _decode_text(data):
+    """Decode a text frame body the same way mutagen does (values joined with NUL)"""
+    if not data:
+        raise FastPathError("empty text frame")
+    if data[0] not in TEXT_ENCODINGS:
+        raise FastPathError(f"unknown text encoding {data[0]}")
+    codec, terminator = TEXT_ENCODINGS[data[0]]
+    data = data[1:]
+    step = len(terminator)
+
+    values = []
+    while data:
+        end = 0
+        while True:
+            end = data.find(terminator, end)
+            if end == -1 or end % step == 0:
+                break
+            end += 1
+        if end == -1:
+            value, data = data, b''
+        else:
+            value, data = data[:end], data[end + step:]
+        values.append(value.decode(codec))
+    return '\u0000'.join(values)
+
+def read_text_frames(filepath, frame_ids):
+    """Read only the ID3v2 header and the wanted text frames; other frames (e.g. APIC) are skipped with seeks.
+
+    Returns {frame_id: text} for the frames found. Raises FastPathError for layouts we leave to mutagen.
+    """
+    wanted = set(frame_ids)
+    found = {}
+
+    with open(filepath, 'rb') as f:
+        header = f.read(10)
+        if len(header) < 10 or header[:3] != b'ID3':
+            raise FastPathError("no ID3v2 header")
+
+        major, flags = header[3], header[5]
+        if major not in (3, 4):
+            raise FastPathError(f"unsupported ID3v2.{major}")
+        if flags & 0xC0:
+            # Unsynchronisation or extended header
+            raise FastPathError("unsynchronised tag or extended header")
+
+        tag_end = 10 + _syncsafe(header[6:10])
+        position = 10
+
+        while position + 10 <= tag_end and wanted - found.keys():
+            f.seek(position)
+            frame_header = f.read(10)
+            if len(frame_header) < 10 or frame_header[0] == 0:
+                # Padding or truncated file
+                break
+            frame_id = frame_header[:4]
+            if not _valid_frame_id(frame_id):
+                raise FastPathError("invalid frame id")
+
+            size_bytes = frame_header[4:8]
+            size = _syncsafe(size_bytes) if major == 4 else struct.unpack('>I', size_bytes)[0]
+            frame_flags = struct.unpack('>H', frame_header[8:10])[0]
+            position += 10 + size
+            if position > tag_end:
+                raise FastPathError("frame exceeds tag size")
+
+            name = frame_id.decode('ascii')
+            if name not in wanted or name in found:
+                continue
+
+            # v2.4: grouping/compression/encryption/unsync/length indicator, v2.3: compression/encryption/grouping
+            if frame_flags & (0x004F if major == 4 else 0x00E0):
+                raise FastPathError("unsupported frame flags")
+            if size > MAX_TEXT_FRAME_SIZE:
+                raise FastPathError("text frame too large")
+
+            data = f.read(size)
+            if len(data) < size:
+                raise FastPathError("truncated frame")
+
+            # Make sure the next header lines up, otherwise the size was not what we think (old iTunes v2.4 tags)
+            if position + 10 <= tag_end:
+                next_id = f.read(4)
+                if next_id and next_id[0] != 0 and not _valid_frame_id(next_id):
+                    raise FastPathError("frame size mismatch")
+
+            found[name] = _decode_text(data)
+
+    return found
+
+def read_artist_title(filepath):
+    """Return raw (artist, title) from TPE1/TIT2, empty strings if missing.
+
+    Uses the header-only reader and falls back to mutagen (ID3v1, v2.2, unsync, ...) when it can't answer.
+    """
+    try:
+        frames = read_text_frames(filepath, ('TPE1', 'TIT2'))
+        if 'TPE1' in frames and 'TIT2' in frames:
+            return frames['TPE1'], frames['TIT2']
+    except (FastPathError, OSError, UnicodeDecodeError):
+        pass
+
+    audio = MP3(filepath, ID3=ID3)
+    artist = ""
+    title = ""
+    if audio.tags:
+        if 'TPE1' in audio.tags:
+            artist = str(audio.tags['TPE1'])
+        if 'TIT2' in audio.tags:
+            title = str(audio.tags['TIT2'])
+    return artist, title
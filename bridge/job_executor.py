@@ -0,0 +1,128 @@
+import os
+import time
+import queue
+import logging
+import itertools
+import threading
+from library_store import write_json
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUS_PATH = os.getenv("JOB_STATUS_PATH", "/music/bridge_jobs.json")
+# Finished jobs kept in the status file
+JOB_HISTORY = 50
+
+class Job:
+    def __init__(self, job_id, lane, name, fn, args):
+        self.id = job_id
+        self.lane = lane
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.status = "queued"
+        self.progress = ""
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'lane': self.lane,
+            'name': self.name,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+class JobExecutor:
+    """Runs jobs on independent worker lanes, so a long job in one lane doesn't hold up the others.
+
+    `lanes` maps a lane name to its number of worker threads; jobs in a lane run in submission order.
+    A job already queued or running under the same name is not submitted again. The status of every
+    job is logged and written to `status_path` on each change.
+    """
+
+    def __init__(self, lanes, status_path=JOB_STATUS_PATH):
+        self.lanes = dict(lanes)
+        self.status_path = status_path
+        self.lock = threading.Lock()
+        self.queues = {lane: queue.Queue() for lane in self.lanes}
+        self.ids = itertools.count(1)
+        self.jobs = []
+        self.running = {}
+        self.threads = []
+
+    def start(self):
+        for lane, workers in self.lanes.items():
+            for n in range(max(1, workers)):
+                thread = threading.Thread(target=self._worker, args=(lane,), name=f"{lane}-{n + 1}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, lane, name, fn, *args):
+        """Queue fn(*args) on `lane`; returns the Job, or None if a job of that name is already pending"""
+        with self.lock:
+            if any(job.lane == lane and job.name == name and job.status in ("queued", "running") for job in self.jobs):
+                logger.info(f"Job '{name}' is already queued or running, not submitting it again")
+                return None
+            job = Job(next(self.ids), lane, name, fn, args)
+            self.jobs.append(job)
+        logger.info(f"Job #{job.id} '{name}' queued on the {lane} lane")
+        self._write_status()
+        self.queues[lane].put(job)
+        return job
+
+    def report(self, progress):
+        """Set the progress text of the job running on the calling thread (no-op outside a job)"""
+        job = self.running.get(threading.get_ident())
+        if job is None:
+            return
+        job.progress = progress
+        logger.info(f"Job #{job.id} '{job.name}': {progress}")
+        self._write_status()
+
+    def running_count(self):
+        """Number of jobs running right now, across all lanes"""
+        return len(self.running)
+
+    def _worker(self, lane):
+        while True:
+            job = self.queues[lane].get()
+            job.status = "running"
+            job.started = time.time()
+            self.running[threading.get_ident()] = job
+            logger.info(f"Job #{job.id} '{job.name}' started")
+            self._write_status()
+            try:
+                job.fn(*job.args)
+                job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.error(f"Job #{job.id} '{job.name}' failed: {e}")
+            finally:
+                del self.running[threading.get_ident()]
+                job.finished = time.time()
+            logger.info(f"Job #{job.id} '{job.name}' {job.status} in {job.finished - job.started:.0f}s")
+            self._prune()
+            self._write_status()
+
+    def _prune(self):
+        with self.lock:
+            finished = [job for job in self.jobs if job.status in ("done", "failed")]
+            for job in finished[:-JOB_HISTORY]:
+                self.jobs.remove(job)
+
+    def _write_status(self):
+        if not self.status_path:
+            return
+        try:
+            with self.lock:
+                write_json(self.status_path, [job.to_dict() for job in self.jobs])
+        except Exception as e:
+            logger.warning(f"Could not write job status {self.status_path}: {e}")
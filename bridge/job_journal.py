@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from candidate_ranking import Candidate
+
+logger = logging.getLogger(__name__)
+
+JOB_JOURNAL_PATH = os.getenv("JOB_JOURNAL_PATH", "/music/bridge_journal.db")
+# An interrupted run older than this is abandoned instead of resumed
+JOURNAL_RESUME_HOURS = float(os.getenv("JOURNAL_RESUME_HOURS", "24"))
+# Finished runs are forgotten after this many days
+JOURNAL_KEEP_DAYS = 7
+
+# Track stages, in order
+MATCHED = "matched"
+SEARCHED = "searched"
+QUEUED = "queued"
+DOWNLOADED = "downloaded"
+ORGANIZED = "organized"
+
+def download_to_json(download):
+    """The resumable part of a queued download: candidate, alternates and retries used"""
+    return json.dumps({
+        'candidate': list(download['candidate']),
+        'alternates': [list(candidate) for candidate in download['alternates']],
+        'retries': download['retries'],
+    })
+
+def download_from_json(artist, title, data):
+    data = json.loads(data)
+    return {
+        'artist': artist,
+        'title': title,
+        'candidate': Candidate(*data['candidate']),
+        'alternates': [Candidate(*candidate) for candidate in data['alternates']],
+        'retries': data['retries'],
+    }
+
+class JobJournal:
+    """Per-run record of every track's stage in SQLite, committed as it happens.
+
+    A run stays "running" until finish(); if the process dies first, unfinished() hands it back on the
+    next start so the job can pick up each track where it left off.
+    """
+
+    def __init__(self, path=JOB_JOURNAL_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY, name TEXT NOT NULL, status TEXT NOT NULL,
+                started REAL NOT NULL, finished REAL, data TEXT NOT NULL DEFAULT '{}'
+            );
+            CREATE INDEX IF NOT EXISTS runs_name ON runs(name, status);
+            CREATE TABLE IF NOT EXISTS tracks (
+                run_id INTEGER NOT NULL, key TEXT NOT NULL, artist TEXT NOT NULL, title TEXT NOT NULL,
+                stage TEXT NOT NULL, download TEXT, path TEXT, updated REAL NOT NULL,
+                PRIMARY KEY (run_id, key)
+            );
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def start(self, name, data, tracks=()):
+        """Open a run for job `name` with its `tracks` (key, track) at the matched stage; returns the run id"""
+        now = time.time()
+        with self.lock:
+            # Abandon any interrupted run of the same job and forget old ones
+            self.conn.execute("UPDATE runs SET status = 'abandoned', finished = ? WHERE name = ? AND status = 'running'",
+                              (now, name))
+            expired = now - JOURNAL_KEEP_DAYS * 86400
+            self.conn.execute("DELETE FROM tracks WHERE run_id IN (SELECT id FROM runs WHERE finished < ?)", (expired,))
+            self.conn.execute("DELETE FROM runs WHERE finished < ?", (expired,))
+
+            run_id = self.conn.execute("INSERT INTO runs (name, status, started, data) VALUES (?, 'running', ?, ?)",
+                                       (name, now, json.dumps(data, ensure_ascii=False))).lastrowid
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tracks (run_id, key, artist, title, stage, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, key, track['artist'], track['title'], MATCHED, now) for key, track in tracks])
+            self.conn.commit()
+        return run_id
+
+    def unfinished(self, name):
+        """The interrupted run of job `name` as {'id', 'started', 'data'}, or None if there is none recent enough"""
+        with self.lock:
+            row = self.conn.execute("SELECT id, started, data FROM runs WHERE name = ? AND status = 'running' "
+                                    "ORDER BY id DESC LIMIT 1", (name,)).fetchone()
+        if not row or time.time() - row['started'] > JOURNAL_RESUME_HOURS * 3600:
+            return None
+        return {'id': row['id'], 'started': row['started'], 'data': json.loads(row['data'])}
+
+    def last_completed(self, name):
+        """When the last run of job `name` finished successfully (epoch seconds), or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT MAX(finished) FROM runs WHERE name = ? AND status = 'done'",
+                                    (name,)).fetchone()
+        return row[0]
+
+    def finish(self, run_id, status="done"):
+        """Close a run; any status but "done" (e.g. "failed") is neither resumed nor counted as completed"""
+        with self.lock:
+            self.conn.execute("UPDATE runs SET status = ?, finished = ? WHERE id = ?", (status, time.time(), run_id))
+            self.conn.commit()
+
+    def set_stage(self, run_id, key, stage, download=None, path=None):
+        """Record that a track reached `stage`; a queued download is stored so it can be tracked again"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE tracks SET stage = ?, download = COALESCE(?, download), path = COALESCE(?, path), updated = ? "
+                "WHERE run_id = ? AND key = ?",
+                (stage, download_to_json(download) if download else None, path, time.time(), run_id, key))
+            self.conn.commit()
+
+    def tracks(self, run_id):
+        """Tracks of a run as {'key', 'artist', 'title', 'stage', 'download', 'path'}, in the order they were added"""
+        with self.lock:
+            rows = self.conn.execute("SELECT key, artist, title, stage, download, path FROM tracks "
+                                     "WHERE run_id = ? ORDER BY rowid", (run_id,)).fetchall()
+        tracks = []
+        for row in rows:
+            track = dict(row)
+            if track['download']:
+                track['download'] = download_from_json(track['artist'], track['title'], track['download'])
+            tracks.append(track)
+        return tracks
@@ -0,0 +1,473 @@
+import os
+import json
+import sqlite3
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from normalize import normalize_string, normalize_transliterated, cached_forms
+from audio_hash import load_hash_index, LIBRARY_HASH_INDEX_PATH
+
+logger = logging.getLogger(__name__)
+
+LIBRARY_INDEX_PATH = "/music/library_index.json"
+LIBRARY_DB_PATH = "/music/library_index.db"
+# "json" (default) or "sqlite"
+LIBRARY_BACKEND = os.getenv("LIBRARY_BACKEND", "json")
+
+# Index file format:
+#   v1: {"artist - title": {path, original_filename, canonical_name}}
+#   v2: {"version": 2, "tracks": {...}} with precomputed normalized forms per entry
+INDEX_VERSION = 2
+
+# Entry fields stored as columns in the SQLite store (token lists are derived from name_norm/name_uni)
+ENTRY_FIELDS = [
+    "path", "original_filename", "canonical_name", "artist", "title",
+    "artist_norm", "title_norm", "artist_uni", "title_uni",
+    "name_norm", "name_uni", "stem_norm",
+]
+
+def add_normalized_forms(entry):
+    """Add precomputed normalized (direct + transliterated) forms and token sets to an index entry"""
+    canonical_name = entry['canonical_name']
+    stem = os.path.splitext(canonical_name)[0]
+
+    if 'artist' not in entry or 'title' not in entry:
+        parts = stem.split(" - ", 1) if " - " in stem else ["", stem]
+        entry['artist'] = parts[0].strip()
+        entry['title'] = parts[1].strip()
+
+    entry['artist_norm'] = normalize_string(entry['artist'])
+    entry['title_norm'] = normalize_string(entry['title'])
+    entry['artist_uni'] = normalize_transliterated(entry['artist'])
+    entry['title_uni'] = normalize_transliterated(entry['title'])
+
+    # Forms of the full canonical name, as compared by matches_track()
+    entry['name_norm'] = normalize_string(canonical_name)
+    entry['name_uni'] = normalize_transliterated(canonical_name)
+    entry['stem_norm'] = normalize_string(stem)
+    entry['tokens_norm'] = sorted(set(entry['name_norm'].split()))
+    entry['tokens_uni'] = sorted(set(entry['name_uni'].split()))
+    return entry
+
+def read_library_index(path):
+    """Load a library index file (v1 or v2) and return {key: entry} with normalized forms present"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if isinstance(data.get('version'), int):
+        if data['version'] > INDEX_VERSION:
+            logger.warning(f"Library index version {data['version']} is newer than supported ({INDEX_VERSION})")
+        return data.get('tracks', {})
+
+    # v1: plain mapping, compute forms in memory
+    for entry in data.values():
+        add_normalized_forms(entry)
+    return data
+
+def write_json(path, data):
+    """Write JSON atomically so a crash never leaves a truncated file behind"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def query_forms(artist, title):
+    """Normalized (direct, transliterated) forms of a Spotify artist/title, as used by matches_track()"""
+    a, t = cached_forms(artist), cached_forms(title)
+    return {'norm': (a.norm, t.norm), 'uni': (a.uni, t.uni)}
+
+# --- JSON store (whole index in memory) ---
+
+class JsonLibraryStore:
+    """Library index kept in memory as {key: entry}, fuzzy lookups through an inverted token index"""
+
+    def __init__(self, tracks=None):
+        self.tracks = tracks if tracks is not None else {}
+        self._token_index = None
+
+    @classmethod
+    def load(cls, path):
+        return cls(read_library_index(path))
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def get(self, key):
+        return self.tracks.get(key)
+
+    def upsert(self, key, entry):
+        self.tracks[key] = entry
+        self._token_index = None
+
+    def delete(self, key):
+        if self.tracks.pop(key, None) is not None:
+            self._token_index = None
+
+    def items(self):
+        return iter(self.tracks.items())
+
+    def close(self):
+        pass
+
+    def _build_token_index(self):
+        """Build an inverted token index over library canonical names (direct + transliterated forms)"""
+        entries = list(self.tracks.values())
+        postings = {'norm': {}, 'uni': {}}
+
+        for position, entry in enumerate(entries):
+            for form in ('norm', 'uni'):
+                for token in entry[f'tokens_{form}']:
+                    postings[form].setdefault(token, set()).add(position)
+
+        logger.info(f"Built library token index: {len(entries)} entries, {len(postings['norm'])} tokens.")
+        return {'entries': entries, 'postings': postings, 'cache': {}}
+
+    def _token_candidates(self, form, text):
+        """Positions of entries whose name can contain `text` as a substring (None = no constraint)"""
+        tokens = text.split()
+        if not tokens:
+            # Empty string is contained in every name
+            return None
+
+        token_index = self._token_index
+        postings = token_index['postings'][form]
+
+        # Inner tokens of a multi-word phrase must be whole tokens of the name
+        if len(tokens) >= 3:
+            return postings.get(max(tokens[1:-1], key=len), set())
+
+        # Edge tokens may be cut off inside a name token -> substring search over the vocabulary
+        token = max(tokens, key=len)
+        cache_key = (form, token)
+        if cache_key not in token_index['cache']:
+            positions = set()
+            for vocab_token, vocab_positions in postings.items():
+                if token in vocab_token:
+                    positions |= vocab_positions
+            token_index['cache'][cache_key] = positions
+        return token_index['cache'][cache_key]
+
+    def entries(self):
+        """Entries in index order; positions returned by candidates() index into this list"""
+        if self._token_index is None:
+            self._token_index = self._build_token_index()
+        return self._token_index['entries']
+
+    def candidates(self, form, a_form, t_form):
+        """Positions of entries whose `name_<form>` may contain both strings (a superset, verify with `in`)"""
+        entries = self.entries()
+        artist_positions = self._token_candidates(form, a_form)
+        title_positions = self._token_candidates(form, t_form)
+
+        if artist_positions is None and title_positions is None:
+            return set(range(len(entries)))
+        if artist_positions is None:
+            return title_positions
+        if title_positions is None:
+            return artist_positions
+        return artist_positions & title_positions
+
+    def find_fuzzy(self, artist, title):
+        """Return the first entry (in index order) matching artist/title, same as a linear matches_track scan"""
+        entries = self.entries()
+        query = query_forms(artist, title)
+        candidates = set()
+        for form, (a_form, t_form) in query.items():
+            candidates |= self.candidates(form, a_form, t_form)
+
+        # Same dual check as matches_track(), against the precomputed name forms
+        for position in sorted(candidates):
+            entry = entries[position]
+            for form, (a_form, t_form) in query.items():
+                if a_form in entry[f'name_{form}'] and t_form in entry[f'name_{form}']:
+                    return entry
+        return None
+
+# --- SQLite store (queried on demand, never loaded whole) ---
+
+class SqliteLibraryStore:
+    """Library index in SQLite with a trigram FTS5 table for fuzzy candidate search.
+
+    `position` keeps the JSON index order so fuzzy lookups return the same entry as JsonLibraryStore.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # The scanner looks up file state from its walker thread while the main thread writes
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self.scan_positions = 0
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(f"{field} TEXT NOT NULL DEFAULT ''" for field in ENTRY_FIELDS)
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS tracks (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, "
+            f"position INTEGER NOT NULL, {columns})"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tracks_position ON tracks(position)")
+        # Per-file scan state (stat fingerprint, tags, audio hash); position is the walk order
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, position INTEGER NOT NULL, "
+            "size INTEGER NOT NULL, mtime INTEGER NOT NULL, inode INTEGER NOT NULL, "
+            "artist TEXT NOT NULL DEFAULT '', title TEXT NOT NULL DEFAULT '', audio_hash TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_audio_hash ON files(audio_hash, position)")
+        self.fts = self._ensure_fts()
+        self.conn.commit()
+
+    def _ensure_fts(self):
+        """Create the trigram FTS table and sync triggers; fall back to plain scans if SQLite lacks it"""
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5("
+                "name_norm, name_uni, content='tracks', content_rowid='id', tokenize='trigram')"
+            )
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite FTS5 trigram tokenizer unavailable, using table scans: {e}")
+            return False
+
+        self.conn.executescript("""
+            CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN
+                INSERT INTO tracks_fts(rowid, name_norm, name_uni) VALUES (new.id, new.name_norm, new.name_uni);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN
+                INSERT INTO tracks_fts(tracks_fts, rowid, name_norm, name_uni) VALUES ('delete', old.id, old.name_norm, old.name_uni);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE OF name_norm, name_uni ON tracks BEGIN
+                INSERT INTO tracks_fts(tracks_fts, rowid, name_norm, name_uni) VALUES ('delete', old.id, old.name_norm, old.name_uni);
+                INSERT INTO tracks_fts(rowid, name_norm, name_uni) VALUES (new.id, new.name_norm, new.name_uni);
+            END;
+        """)
+        return True
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def _row_to_entry(self, row):
+        entry = {field: row[field] for field in ENTRY_FIELDS}
+        entry['tokens_norm'] = sorted(set(entry['name_norm'].split()))
+        entry['tokens_uni'] = sorted(set(entry['name_uni'].split()))
+        return entry
+
+    def get(self, key):
+        row = self.conn.execute("SELECT * FROM tracks WHERE key = ?", (key,)).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def upsert(self, key, entry, position=None):
+        """Insert or update an entry; new keys go to the end unless a position is given"""
+        if position is None:
+            existing = self.conn.execute("SELECT position FROM tracks WHERE key = ?", (key,)).fetchone()
+            if existing:
+                position = existing[0]
+            else:
+                position = self.conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM tracks").fetchone()[0]
+
+        values = [entry.get(field, '') for field in ENTRY_FIELDS]
+        assignments = ", ".join(f"{field} = excluded.{field}" for field in ENTRY_FIELDS)
+        self.conn.execute(
+            f"INSERT INTO tracks (key, position, {', '.join(ENTRY_FIELDS)}) "
+            f"VALUES (?, ?, {', '.join('?' for _ in ENTRY_FIELDS)}) "
+            f"ON CONFLICT(key) DO UPDATE SET position = excluded.position, {assignments}",
+            [key, position] + values
+        )
+
+    def delete(self, key):
+        self.conn.execute("DELETE FROM tracks WHERE key = ?", (key,))
+
+    def commit(self):
+        self.conn.commit()
+
+    def items(self):
+        for row in self.conn.execute("SELECT * FROM tracks ORDER BY position"):
+            yield row['key'], self._row_to_entry(row)
+
+    def _first_match(self, form, a_form, t_form):
+        """Lowest-position row whose name form contains both strings (exact, like Python's `in`)"""
+        column = f"name_{form}"
+        sql = f"SELECT * FROM tracks WHERE instr({column}, ?) > 0 AND instr({column}, ?) > 0"
+        params = [a_form, t_form]
+
+        # Trigram MATCH needs at least 3 characters; it only narrows rows, instr() decides
+        phrases = [text for text in (a_form, t_form) if len(text) >= 3]
+        if self.fts and phrases:
+            match = " AND ".join(f'{column} : "{text.replace(chr(34), chr(34) * 2)}"' for text in phrases)
+            sql += " AND id IN (SELECT rowid FROM tracks_fts WHERE tracks_fts MATCH ?)"
+            params.append(match)
+
+        return self.conn.execute(sql + " ORDER BY position LIMIT 1", params).fetchone()
+
+    def find_fuzzy(self, artist, title):
+        """Return the first entry (in index order) matching artist/title, same as a linear matches_track scan"""
+        best = None
+        for form, (a_form, t_form) in query_forms(artist, title).items():
+            row = self._first_match(form, a_form, t_form)
+            if row and (best is None or row['position'] < best['position']):
+                best = row
+        return self._row_to_entry(best) if best else None
+
+    # --- Incremental scan: files and tracks are upserted as the scan streams ---
+
+    def file_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def file_state(self, path):
+        """Scan state of a file from the previous run: {size, mtime, inode, artist, title, position[, audio_hash]}"""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        state = {field: row[field] for field in ("size", "mtime", "inode", "artist", "title", "position")}
+        if row['audio_hash']:
+            state['audio_hash'] = row['audio_hash']
+        return state
+
+    def import_file_states(self, states):
+        """Seed the files table from a library_scan_state.json mapping {path: state}"""
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (path, position, size, mtime, inode, artist, title, audio_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(path, position, state['size'], state['mtime'], state['inode'], state.get('artist', ''),
+                  state.get('title', ''), state.get('audio_hash')) for position, (path, state) in enumerate(states.items())])
+            self.conn.commit()
+
+    def begin_scan(self):
+        """Start a scan: files and keys seen are collected in temp tables until finish_scan()"""
+        with self.lock:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS scan_files (path TEXT PRIMARY KEY)")
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS scan_keys (key TEXT PRIMARY KEY, position INTEGER NOT NULL)")
+            self.conn.execute("DELETE FROM scan_files")
+            self.conn.execute("DELETE FROM scan_keys")
+            self.scan_positions = 0
+
+    def scan_file(self, path, position, record, previous):
+        """Record a scanned file; the row is only written if its state or walk position changed"""
+        row = (position, record['size'], record['mtime'], record['inode'], record['artist'], record['title'],
+               record.get('audio_hash'))
+        with self.lock:
+            self.conn.execute("INSERT OR IGNORE INTO scan_files (path) VALUES (?)", (path,))
+            if previous is not None and row == tuple(previous.get(field) for field in (
+                    "position", "size", "mtime", "inode", "artist", "title", "audio_hash")):
+                return False
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, position, size, mtime, inode, artist, title, audio_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (path,) + row)
+            return True
+
+    def scan_track(self, key, path, canonical_name, make_entry):
+        """Record a track seen by the scan, as sync() would for the same {key: entry} built in walk order.
+
+        The first file with a key fixes its position and a later one replaces the entry. make_entry() is only
+        called when the row has to be written. Returns True if it was.
+        """
+        with self.lock:
+            seen = self.conn.execute("SELECT position FROM scan_keys WHERE key = ?", (key,)).fetchone()
+            if seen:
+                self.upsert(key, make_entry(), seen[0])
+                return True
+            position = self.scan_positions
+            self.scan_positions += 1
+            self.conn.execute("INSERT INTO scan_keys (key, position) VALUES (?, ?)", (key, position))
+            stored = self.conn.execute("SELECT position, path, canonical_name FROM tracks WHERE key = ?", (key,)).fetchone()
+            if stored and tuple(stored) == (position, path, canonical_name):
+                return False
+            self.upsert(key, make_entry(), position)
+            return True
+
+    def finish_scan(self):
+        """Delete tracks and files the scan didn't see and commit; returns (tracks deleted, files removed)"""
+        with self.lock:
+            deleted = self.conn.execute("DELETE FROM tracks WHERE key NOT IN (SELECT key FROM scan_keys)").rowcount
+            removed = self.conn.execute("DELETE FROM files WHERE path NOT IN (SELECT path FROM scan_files)").rowcount
+            self.conn.commit()
+        return deleted, removed
+
+    def hash_index(self):
+        return SqliteHashIndex(self)
+
+    def export_json(self, path):
+        """Write the store in the library_index.json (v2) format"""
+        tracks = dict(self.items())
+        write_json(path, {"version": INDEX_VERSION, "tracks": tracks})
+        return len(tracks)
+
+class SqliteHashIndex:
+    """{audio hash: first library path in walk order} over the files table, queried per lookup"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, audio_hash, default=None):
+        with self.store.lock:
+            row = self.store.conn.execute("SELECT path FROM files WHERE audio_hash = ? ORDER BY position LIMIT 1",
+                                          (audio_hash,)).fetchone()
+        return row[0] if row else default
+
+    def __getitem__(self, audio_hash):
+        path = self.get(audio_hash)
+        if path is None:
+            raise KeyError(audio_hash)
+        return path
+
+    def __contains__(self, audio_hash):
+        return self.get(audio_hash) is not None
+
+    def __bool__(self):
+        with self.store.lock:
+            return self.store.conn.execute("SELECT 1 FROM files WHERE audio_hash IS NOT NULL LIMIT 1").fetchone() is not None
+
+    def __len__(self):
+        with self.store.lock:
+            return self.store.conn.execute("SELECT COUNT(DISTINCT audio_hash) FROM files").fetchone()[0]
+
+@contextmanager
+def open_hash_index(backend=LIBRARY_BACKEND, db_path=LIBRARY_DB_PATH, hashes_path=LIBRARY_HASH_INDEX_PATH):
+    """Audio hash lookup written by scan_library, for a `with` block: the SQLite files table or library_hashes.json.
+
+    The SQLite lookup queries per hash, so its connection stays open until the block ends.
+    """
+    if backend == "sqlite" and os.path.exists(db_path):
+        store = SqliteLibraryStore(db_path)
+        try:
+            yield store.hash_index()
+        finally:
+            store.close()
+    else:
+        yield load_hash_index(hashes_path)
+
+def open_library_store(backend=LIBRARY_BACKEND):
+    """Open the configured library store; an empty JSON store if nothing has been scanned yet"""
+    try:
+        if backend == "sqlite":
+            if os.path.exists(LIBRARY_DB_PATH):
+                return SqliteLibraryStore(LIBRARY_DB_PATH)
+            logger.warning(f"Library database {LIBRARY_DB_PATH} not found. Run scan_library.py first.")
+            return JsonLibraryStore()
+
+        if not os.path.exists(LIBRARY_INDEX_PATH):
+            logger.warning("Library index not found. Run scan_library.py first.")
+            return JsonLibraryStore()
+        return JsonLibraryStore.load(LIBRARY_INDEX_PATH)
+    except Exception as e:
+        logger.error(f"Error loading library index: {e}")
+        return JsonLibraryStore()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Library index store utilities")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Export the SQLite store to library_index.json (v2)")
+    export_parser.add_argument("--db", default=LIBRARY_DB_PATH)
+    export_parser.add_argument("--output", default=LIBRARY_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        store = SqliteLibraryStore(args.db)
+        count = store.export_json(args.output)
+        store.close()
+        logger.info(f"Exported {count} tracks to {args.output}")
@@ -1,19 +1,33 @@
 import os
+import json
 import time
 import schedule
 import logging
-import requests
-import hashlib
 import random
 import string
-import spotipy
-import re
 import shutil
+import argparse
+import threading
 from datetime import datetime, timedelta
-from spotipy.oauth2 import SpotifyClientCredentials
+from concurrent.futures import ThreadPoolExecutor, wait
 from mutagen.mp3 import MP3
 from mutagen.id3 import ID3, TPE1, TPE2, TIT2, TALB, TCMP, APIC
-from unidecode import unidecode
+from normalize import clean_string, sanitize_filename, cached_forms, forms_cache_stats, clear_forms_cache
+from library_store import open_library_store, open_hash_index, write_json
+from search_scheduler import RateLimiter, run_searches
+from slskd_client import SlskdClient
+from candidate_ranking import Candidate, rank_candidates
+from query_planner import plan_queries, match_names, merge_responses
+from search_cache import SearchCache, QUEUED, NO_RESULTS, NO_MATCH
+from transfer_tracker import track_transfers, find_downloaded_file, local_download_path
+from id3_reader import read_artist_title, read_text_frames, FastPathError
+from spotify_playlists import SpotifyPlaylists
+from expected_tracks import ExpectedTracks
+from audio_hash import hash_audio
+from watch_folder import WatchFolder
+from job_executor import JobExecutor
+from shared_downloads import SharedDownloads
+from job_journal import JobJournal, MATCHED, SEARCHED, DOWNLOADED, ORGANIZED, QUEUED as STAGE_QUEUED
 
 # Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -23,6 +37,10 @@ logger = logging.getLogger(__name__)
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_PLAYLIST_ID = os.getenv("SPOTIFY_PLAYLIST_ID")
+# Daily sync follows every playlist in SPOTIFY_PLAYLIST_IDS (comma-separated), or just SPOTIFY_PLAYLIST_ID
+SPOTIFY_PLAYLIST_IDS = [playlist.strip() for playlist in (os.getenv("SPOTIFY_PLAYLIST_IDS") or SPOTIFY_PLAYLIST_ID or "").split(",")
+                        if playlist.strip()]
+SPOTIFY_FETCH_WORKERS = 4
 
 NAVIDROME_URL = os.getenv("NAVIDROME_URL")
 NAVIDROME_USER = os.getenv("NAVIDROME_USER")
@@ -30,63 +48,84 @@ NAVIDROME_PASS = os.getenv("NAVIDROME_PASS")
 
 SLSKD_URL = os.getenv("SLSKD_URL")
 SLSKD_API_KEY = os.getenv("SLSKD_API_KEY")
+# Per-call HTTP read timeout (seconds) and retries for idempotent slskd API calls
+SLSKD_HTTP_TIMEOUT = float(os.getenv("SLSKD_HTTP_TIMEOUT", "15"))
+SLSKD_HTTP_RETRIES = int(os.getenv("SLSKD_HTTP_RETRIES", "3"))
+# Searches kept in flight against slskd at once, and a global cap on how fast new ones start
+SLSKD_MAX_CONCURRENT_SEARCHES = int(os.getenv("SLSKD_MAX_CONCURRENT_SEARCHES", "4"))
+SLSKD_SEARCHES_PER_MINUTE = int(os.getenv("SLSKD_SEARCHES_PER_MINUTE", "20"))
+DAILY_SEARCH_LIMIT = 50
+# Search polling: deadline, adaptive poll interval and the early-stop quality bar
+SLSKD_SEARCH_TIMEOUT = float(os.getenv("SLSKD_SEARCH_TIMEOUT", "45"))
+SLSKD_POLL_INITIAL_INTERVAL = 0.5
+SLSKD_POLL_MAX_INTERVAL = 5.0
+SLSKD_MIN_BITRATE = 320
+SLSKD_EARLY_STOP_CANDIDATES = int(os.getenv("SLSKD_EARLY_STOP_CANDIDATES", "1"))
+SLSKD_EARLY_STOP_MAX_QUEUE = int(os.getenv("SLSKD_EARLY_STOP_MAX_QUEUE", "10"))
+# Seconds the raw query gets to find an acceptable file before the other query variants start
+SLSKD_VARIANT_STAGE_DELAY = float(os.getenv("SLSKD_VARIANT_STAGE_DELAY", "8"))
+# How long to follow queued transfers before organizing what has arrived
+SLSKD_TRANSFER_TIMEOUT = float(os.getenv("SLSKD_TRANSFER_TIMEOUT", "900"))
+SLSKD_TRANSFER_POLL_INTERVAL = 5.0
+# Failover: a transfer moving slower than SLSKD_MIN_TRANSFER_RATE bytes/s over SLSKD_STALL_WINDOW seconds
+# is cancelled and re-queued from the next-best peer, at most SLSKD_TRANSFER_RETRIES times per track
+SLSKD_STALL_WINDOW = float(os.getenv("SLSKD_STALL_WINDOW", "180"))
+SLSKD_MIN_TRANSFER_RATE = int(os.getenv("SLSKD_MIN_TRANSFER_RATE", "4096"))
+SLSKD_TRANSFER_RETRIES = int(os.getenv("SLSKD_TRANSFER_RETRIES", "2"))
 
 # Paths
 SOULSEEK_DOWNLOADS_DIR = "/downloads/_Soulseek"
 DOWNLOADS_ROOT = "/downloads"
 DAILY_MUSIC_DIR = "/music/Daily"
-LIBRARY_INDEX_PATH = "/music/library_index.json"
 WATCH_DIR = "/watch"
+WATCH_EXTENSIONS = (".txt", ".m3u", ".m3u8")
+# "auto" uses inotify and falls back to polling; "poll" forces polling (e.g. network mounts without inotify events)
+WATCH_MODE = os.getenv("WATCH_MODE", "auto")
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "10"))
+# Seconds a new file must stay untouched before it is read
+WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", "1.0"))
+# A playlist whose Spotify fetch failed is tried again after WATCH_POLL_INTERVAL seconds, doubling up to this
+WATCH_RETRY_MAX = float(os.getenv("WATCH_RETRY_MAX", "3600"))
+# Watch-folder playlists processed at the same time (the scheduled sync has its own lane)
+WATCH_JOB_WORKERS = int(os.getenv("WATCH_JOB_WORKERS", "1"))
+# Finished downloads shared between jobs that wanted the same track
+SHARED_DOWNLOADS_DIR = "/downloads/_Shared"
+DAILY_SYNC_JOB = "daily sync"
+# The startup sync is skipped if a full sync finished less than this many hours ago (0 = always run)
+STARTUP_SYNC_SKIP_HOURS = float(os.getenv("STARTUP_SYNC_SKIP_HOURS", "6"))
+# Size + mtime of Daily files whose tags are already normalized, so they aren't even opened
+DAILY_TAGS_MANIFEST = "/music/daily_tags_manifest.json"
+DAILY_TAG_WORKERS = int(os.getenv("DAILY_TAG_WORKERS", "4"))
+
+slskd = SlskdClient(SLSKD_URL, SLSKD_API_KEY, timeout=SLSKD_HTTP_TIMEOUT, retries=SLSKD_HTTP_RETRIES,
+                    pool_size=max(16, SLSKD_MAX_CONCURRENT_SEARCHES * 2))
+search_rate_limiter = RateLimiter(SLSKD_SEARCHES_PER_MINUTE)
+# slskd searches in flight across all tracks, variants and jobs, so together they stay within the budget
+search_slots = threading.BoundedSemaphore(max(1, SLSKD_MAX_CONCURRENT_SEARCHES))
+shared_downloads = SharedDownloads(SHARED_DOWNLOADS_DIR)
+jobs = JobExecutor({'sync': 1, 'watch': WATCH_JOB_WORKERS})
+journal = JobJournal()
+search_cache = SearchCache()
+spotify_playlists = SpotifyPlaylists(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
+# Set up by the main loop
+watcher = None
+# filename -> fingerprint of watch files queued by the startup sweep, not reported by the watcher yet
+swept_watch_files = {}
+# filename -> failed attempts in a row, for the retry back-off
+watch_failures = {}
 
 # --- Utils ---
 
-def clean_string(text):
-    """Remove common clutter from strings like (Radio Edit), (Ft. ...), etc."""
-    if not text:
-        return ""
-    
-    # 1. Remove text inside brackets/parentheses containing keywords
-    keywords = r"\bradio\b|\bedit\b|\bmix\b|\bremix\b|\bremaster\b|\bfeat\b|\bft\.IBLE\b|\bfeature\b|\bextended\b|\bclub\b|\boriginal\b|\bvocal\b|\bversion\b"
-    pattern = r'\s*[(\[][^\x29\x5D]*?(?:' + keywords + r')[^\x29\x5D]*?[)\x5D]'
-    
-    prev_text = None
-    while text != prev_text:
-        prev_text = text
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-
-    # 2. Remove trailing " - Radio Edit" etc patterns (no brackets)
-    text = re.sub(r'\s*-\s*.*?(?:' + keywords + r').*?$', '', text, flags=re.IGNORECASE)
-
-    # 3. Remove "Ft. Artist" (no brackets)
-    text = re.sub(r'\s+(?:feat|ft\.|feature)\.?\s+.*$', '', text, flags=re.IGNORECASE)
-
-    return text.strip()
-
-def normalize_string(s):
-    """Normalize string for matching: lowercase, remove special chars"""
-    # Remove special characters, keep only alphanumeric and spaces
-    s = re.sub(r'[^\w\s]', ' ', s.lower())
-    # Replace multiple spaces with single space
-    s = re.sub(r'\s+', ' ', s).strip()
-    return s
-
 def matches_track(filename, artist, title):
     """Check if filename contains artist and title (Dual Check: As-Is & Transliterated)"""
+    f, a, t = cached_forms(filename), cached_forms(artist), cached_forms(title)
     
     # Check 1: Direct comparison (Handles Cyrillic==Cyrillic, Latin==Latin)
-    f_norm = normalize_string(filename)
-    a_norm = normalize_string(artist)
-    t_norm = normalize_string(title)
-    
-    if a_norm in f_norm and t_norm in f_norm:
+    if a.norm in f.norm and t.norm in f.norm:
         return True
         
     # Check 2: Transliterated comparison (Handles Cyrillic vs Latin, Umlauts, etc.)
-    f_uni = normalize_string(unidecode(filename))
-    a_uni = normalize_string(unidecode(artist))
-    t_uni = normalize_string(unidecode(title))
-    
-    if a_uni in f_uni and t_uni in f_uni:
+    if a.uni in f.uni and t.uni in f.uni:
         return True
         
     return False
@@ -95,255 +134,508 @@ def matches_track(filename, artist, title):
 
 def get_spotify_playlist_tracks(playlist_id_or_url):
     try:
-        auth_manager = SpotifyClientCredentials(client_id=SPOTIFY_CLIENT_ID, client_secret=SPOTIFY_CLIENT_SECRET)
-        sp = spotipy.Spotify(auth_manager=auth_manager)
-        
-        results = sp.playlist_items(playlist_id_or_url)
-        tracks = results['items']
-        while results['next']:
-            results = sp.next(results)
-            tracks.extend(results['items'])
-            
+        tracks, added, removed = spotify_playlists.sync(playlist_id_or_url)
         logger.info(f"Found {len(tracks)} tracks in Spotify playlist.")
-        parsed_tracks = []
-        for item in tracks:
-            track = item['track']
-            if not track: continue
-            artist = track['artists'][0]['name']
-            title = track['name']
-            parsed_tracks.append({'artist': artist, 'title': title})
-        return parsed_tracks
+        for track in added:
+            logger.debug(f"Added to playlist: {track['artist']} - {track['title']}")
+        for track in removed:
+            logger.debug(f"Removed from playlist: {track['artist']} - {track['title']}")
+        return tracks
     except Exception as e:
         logger.error(f"Error fetching Spotify tracks: {e}")
         return []
 
-def load_library_index():
-    try:
-        import json
-        if not os.path.exists(LIBRARY_INDEX_PATH):
-            logger.warning("Library index not found. Run scan_library.py first.")
-            return {}
-        
-        with open(LIBRARY_INDEX_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Error loading library index: {e}")
+def fetch_playlists(playlists):
+    """Fetch several playlists concurrently; returns {playlist: tracks} in the given order"""
+    if not playlists:
         return {}
+    with ThreadPoolExecutor(max_workers=min(SPOTIFY_FETCH_WORKERS, len(playlists)), thread_name_prefix="spotify") as executor:
+        return dict(zip(playlists, executor.map(get_spotify_playlist_tracks, playlists)))
+
+def track_key(track):
+    """Library lookup key of a track: cleaned, sanitized, lowercase 'artist - title'"""
+    a = sanitize_filename(cached_forms(track['artist']).clean)
+    t = sanitize_filename(cached_forms(track['title']).clean)
+    return f"{a} - {t}".lower()
+
+def merge_playlist_tracks(playlist_tracks):
+    """Tracks of all playlists with duplicates (same track_key) dropped, in first-seen order"""
+    seen = set()
+    merged = []
+    for tracks in playlist_tracks.values():
+        for track in tracks:
+            key = track_key(track)
+            if key not in seen:
+                seen.add(key)
+                merged.append(track)
+    return merged
 
 # --- Slskd Operations ---
 
 def clear_download_queue():
     """Clear all pending downloads from slskd queue"""
     try:
-        headers = {'X-API-Key': SLSKD_API_KEY}
-        response = requests.get(f"{SLSKD_URL}/api/v0/transfers/downloads", headers=headers)
-        if response.status_code != 200:
-            return
-
-        downloads = response.json()
-        cleared_count = 0
-
-        for download in downloads:
-            username = download.get('username')
-            download_id = download.get('id')
-            if username and download_id:
-                try:
-                    del_response = requests.delete(
-                        f"{SLSKD_URL}/api/v0/transfers/downloads/{username}/{download_id}",
-                        headers=headers
-                    )
-                    if del_response.status_code in [200, 204]:
-                        cleared_count += 1
-                except Exception:
-                    pass
+        cleared_count = slskd.clear_downloads()
         if cleared_count > 0:
             logger.info(f"Cleared {cleared_count} pending downloads from queue")
     except Exception as e:
         logger.error(f"Error clearing download queue: {e}")
 
-def search_and_download_slskd(artist, title):
-    try:
-        search_query = f"{artist} {title}"
-        logger.info(f"Searching Slskd for: {search_query}")
-
-        headers = {'X-API-Key': SLSKD_API_KEY}
-
-        # 1. Initiate Search
-        search_payload = {'searchText': search_query}
-        init_response = requests.post(f"{SLSKD_URL}/api/v0/searches", json=search_payload, headers=headers)
-        init_response.raise_for_status()
-        search_id = init_response.json().get('id')
-
-        # 2. Wait and poll for results
-        max_wait = 45 # Reduced wait time slightly
-        check_interval = 5
-        waited = 0
-        results = []
-
-        while waited < max_wait:
-            time.sleep(check_interval)
-            waited += check_interval
-
-            results_response = requests.get(
-                f"{SLSKD_URL}/api/v0/searches/{search_id}?includeResponses=true",
-                headers=headers
-            )
-            results_response.raise_for_status()
-            search_data = results_response.json()
-            results = search_data.get('responses', [])
-            
-            if len(results) > 0:
-                break
+def is_acceptable_file(file, artist, title):
+    """MP3 at SLSKD_MIN_BITRATE or better whose filename matches the track"""
+    filename = file.get('filename', '')
+    if not filename.lower().endswith('.mp3'): return False
+    if (file.get('bitRate') or 0) < SLSKD_MIN_BITRATE: return False
+    return matches_track(filename, artist, title)
+
+def is_acceptable_for(file, names):
+    """is_acceptable_file() for any of the track's (artist, title) name pairs"""
+    return any(is_acceptable_file(file, artist, title) for artist, title in names)
+
+def clears_quality_bar(responses, names):
+    """True once enough peers with a free upload slot and a short queue offer an acceptable file"""
+    good_peers = 0
+    for user_response in responses:
+        if not user_response.get('hasFreeUploadSlot'): continue
+        if (user_response.get('queueLength') or 0) > SLSKD_EARLY_STOP_MAX_QUEUE: continue
+        if any(is_acceptable_for(file, names) for file in user_response.get('files', [])):
+            good_peers += 1
+            if good_peers >= SLSKD_EARLY_STOP_CANDIDATES:
+                return True
+    return False
 
-        if len(results) == 0:
-            logger.warning(f"No results after {max_wait} seconds")
-            return False
+def poll_search(search_query, names):
+    """Run one slskd search with adaptive polling and return its responses.
 
-        # 3. Find FIRST matching MP3 with 320kbps
-        for user_response in results:
-            for file in user_response.get('files', []):
-                filename = file.get('filename', '')
-                bitrate = file.get('bitRate', 0)
-
-                if not filename.lower().endswith('.mp3'): continue
-                if bitrate < 320: continue
-                
-                # Loose check first
-                if not matches_track(filename, artist, title):
-                    continue
+    Polls the cheap search state with growing intervals and only fetches responses when their count
+    changes. Stops when slskd reports the search complete, when the quality bar is cleared, or at the
+    deadline. The search is always deleted from slskd afterwards.
+    """
+    started = time.monotonic()
+    deadline = started + SLSKD_SEARCH_TIMEOUT
+    search_id = slskd.start_search(search_query, int(SLSKD_SEARCH_TIMEOUT * 1000))
 
-                # Found a match!
-                match_info = {
-                    'username': user_response['username'],
-                    'filename': file['filename'],
-                    'size': file['size']
-                }
+    responses = []
+    seen_count = 0
+    first_response_after = None
+    stop_reason = "deadline"
+    interval = SLSKD_POLL_INITIAL_INTERVAL
 
-                logger.info(f"  -> MATCH! Downloading from {user_response['username']}")
+    try:
+        while True:
+            time.sleep(max(0, min(interval, deadline - time.monotonic())))
+            interval = min(interval * 1.5, SLSKD_POLL_MAX_INTERVAL)
+
+            search_data = slskd.get_search(search_id)
+            response_count = search_data.get('responseCount', 0)
+            complete = search_data.get('isComplete') or search_data.get('state', '').startswith('Completed')
+
+            if response_count != seen_count:
+                responses = slskd.get_search_responses(search_id)
+                seen_count = response_count
+                if responses and first_response_after is None:
+                    first_response_after = time.monotonic() - started
+
+            if complete:
+                stop_reason = "complete"
+                break
+            if responses and clears_quality_bar(responses, names):
+                stop_reason = "quality bar"
+                break
+            if time.monotonic() >= deadline:
+                break
+    finally:
+        try:
+            slskd.delete_search(search_id)
+        except Exception as e:
+            logger.debug(f"Could not delete search {search_id}: {e}")
+
+    first = f"{first_response_after:.1f}s" if first_response_after is not None else "never"
+    logger.info(f"Search '{search_query}': {len(responses)} responses in {time.monotonic() - started:.1f}s "
+                f"(first after {first}, stopped: {stop_reason})")
+    return responses
+
+def run_query(label, search_query, names):
+    # Each slskd search holds a slot from start to delete; starts are also rate limited globally
+    with search_slots:
+        search_rate_limiter.acquire()
+        logger.info(f"Searching Slskd for: {search_query} ({label})")
+        return poll_search(search_query, names)
+
+def search_variants(artist, title, names):
+    """Search all query variants of a track and return their merged, deduplicated responses.
+
+    The raw query goes first; unless it finds an acceptable file within SLSKD_VARIANT_STAGE_DELAY
+    seconds, the other variants are started alongside it.
+    """
+    queries = plan_queries(artist, title)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(queries), thread_name_prefix="variant") as executor:
+        futures = [executor.submit(run_query, *queries[0], names)]
+        wait(futures, timeout=SLSKD_VARIANT_STAGE_DELAY)
+
+        primary = futures[0]
+        primary_hit = primary.done() and not primary.exception() and any(
+            is_acceptable_for(file, names) for user_response in primary.result() for file in user_response.get('files', []))
+        if not primary_hit:
+            futures += [executor.submit(run_query, *query, names) for query in queries[1:]]
+
+        response_lists, errors = [], []
+        for future in futures:
+            try:
+                response_lists.append(future.result())
+            except Exception as e:
+                errors.append(e)
+
+    # Only errors: not a real miss, let the caller treat it as a failed search
+    if errors and not response_lists:
+        raise errors[0]
+    responses = merge_responses(response_lists)
+    if len(futures) > 1:
+        logger.info(f"Searched {len(futures)} query variants for {artist} - {title} in "
+                    f"{time.monotonic() - started:.1f}s: {len(responses)} peers after merging")
+    return responses
+
+def queue_download(candidate):
+    """Ask slskd to download one candidate file; returns True if it was queued"""
+    download_payload = [{
+        'filename': candidate.filename,
+        'size': candidate.size
+    }]
+
+    status_code = slskd.queue_download(candidate.username, download_payload)
+    if status_code in [200, 201]:
+        return True
+    logger.error(f"Failed to queue download! Status: {status_code}")
+    return False
 
-                download_payload = [{
-                    'filename': match_info['filename'],
-                    'size': match_info['size']
-                }]
+def search_and_download_slskd(artist, title):
+    """Search for a track and queue the best ranked candidate.
 
-                dl_response = requests.post(
-                    f"{SLSKD_URL}/api/v0/transfers/downloads/{match_info['username']}",
-                    json=download_payload,
-                    headers=headers
-                )
+    Returns the queued download ({'artist', 'title', 'candidate', 'alternates', 'retries'}) or None.
+    """
+    try:
+        search_query = f"{artist} {title}"
 
-                if dl_response.status_code in [200, 201]:
-                    return True
-                else:
-                    logger.error(f"Failed to queue download! Status: {dl_response.status_code}")
-                    continue 
+        # 0. Reuse the candidates of a recent successful search instead of searching again
+        cached = [Candidate(**candidate) for candidate in search_cache.recent_candidates(artist, title)]
+        for position, candidate in enumerate(cached):
+            logger.info(f"  -> Cached match for {search_query}, downloading from {candidate.username}")
+            if queue_download(candidate):
+                return {'artist': artist, 'title': title, 'candidate': candidate,
+                        'alternates': cached[position + 1:], 'retries': 0}
 
+        # 1. Search all query variants and collect responses
+        names = match_names(artist, title)
+        results = search_variants(artist, title, names)
+
+        if len(results) == 0:
+            logger.warning(f"No results for {search_query}")
+            search_cache.record(artist, title, NO_RESULTS)
+            return None
+
+        # 2. Rank every matching MP3 320kbps, queue the best, keep the rest for failover
+        candidates = rank_candidates(results, names, lambda file: is_acceptable_for(file, names))
+        for position, candidate in enumerate(candidates):
+            logger.info(f"  -> MATCH! Downloading from {candidate.username} "
+                        f"(score {candidate.score:.0f}, queue {candidate.queue_length}, {len(candidates)} candidates)")
+            if queue_download(candidate):
+                search_cache.record(artist, title, QUEUED, candidates)
+                return {'artist': artist, 'title': title, 'candidate': candidate,
+                        'alternates': candidates[position + 1:], 'retries': 0}
+
+        if not candidates:
+            search_cache.record(artist, title, NO_MATCH)
         logger.warning(f"No matching MP3 320kbps found for {artist} - {title}")
-        return False
+        return None
 
     except Exception as e:
         logger.error(f"Error with Slskd: {e}")
-        return False
+        return None
+
+def search_track(track):
+    """Search and queue one track; a track another job is already fetching is shared instead of searched again"""
+    if search_cache.should_skip(track['artist'], track['title']):
+        logger.info(f"Skipping search, not found recently: {track['artist']} - {track['title']}")
+        return None
+
+    download = shared_downloads.acquire(track_key(track), lambda: search_and_download_slskd(track['artist'], track['title']))
+    if download and 'subscription' in download:
+        logger.info(f"Already being downloaded by another job: {track['artist']} - {track['title']}")
+        download.update(artist=track['artist'], title=track['title'])
+    return download
+
+def record_stage(download, stage, path=None):
+    """Journal the stage a download reached, for the run that queued it"""
+    if 'run' in download:
+        journal.set_stage(download['run'], track_key(download), stage,
+                          download=download if stage == STAGE_QUEUED else None, path=path)
+
+def journaled_search(run_id):
+    """search_track that records each outcome in the journal run"""
+    def search(track):
+        download = search_track(track)
+        if not download:
+            journal.set_stage(run_id, track_key(track), SEARCHED)
+            return download
+        download['run'] = run_id
+        # A shared download is only ours once it arrives; after a restart it is searched again
+        if 'subscription' not in download:
+            record_stage(download, STAGE_QUEUED)
+        return download
+    return search
+
+def restore_downloads(run_id, journal_tracks):
+    """Downloads an interrupted run had queued, tracked again by this job.
+
+    Their transfers already exist in slskd, so they stay ours even if another job now fetches the same track.
+    """
+    downloads = []
+    for row in journal_tracks:
+        if row['stage'] not in (STAGE_QUEUED, DOWNLOADED) or not row['download']:
+            continue
+        download = row['download']
+        download['run'] = run_id
+        if not shared_downloads.adopt(row['key'], download):
+            logger.info(f"Also being downloaded by another job, tracking ours separately: "
+                        f"{row['artist']} - {row['title']}")
+        downloads.append(download)
+    return downloads
+
+def cancel_transfer(username, transfer):
+    try:
+        slskd.cancel_download(username, transfer['id'])
+    except Exception as e:
+        logger.debug(f"Could not cancel transfer {transfer.get('filename')}: {e}")
+
+def failover_download(download, transfer):
+    """Queue the next-best candidate from the original search in place of a failed or stalled transfer.
+
+    Candidates from the same peer are skipped. The old transfer is only cancelled once its replacement
+    is queued, so a slow transfer with nothing to replace it keeps running. Returns True if re-queued.
+    """
+    failed_user = download['candidate'].username
+    while download['alternates'] and download['retries'] < SLSKD_TRANSFER_RETRIES:
+        candidate = download['alternates'].pop(0)
+        if candidate.username == failed_user:
+            continue
+        download['retries'] += 1
+        logger.info(f"  -> Retrying {download['artist']} - {download['title']} from {candidate.username} "
+                    f"(attempt {download['retries']}/{SLSKD_TRANSFER_RETRIES})")
+        try:
+            if queue_download(candidate):
+                if transfer and transfer.get('id'):
+                    cancel_transfer(failed_user, transfer)
+                download['candidate'] = candidate
+                record_stage(download, STAGE_QUEUED)
+                return True
+        except Exception as e:
+            logger.error(f"Error with Slskd: {e}")
+    return False
+
+def wait_for_downloads(queued, on_downloaded):
+    """Hand each queued download's local file to on_downloaded(download, path) as soon as it finishes.
+
+    Downloads shared from another job arrive once that job's transfer finishes. Returns the local paths
+    of transfers still in progress at the deadline; those must not be touched.
+    """
+    owned = [download for download in queued if 'subscription' not in download]
+    subscribed = [download for download in queued if 'subscription' in download]
+
+    def on_succeeded(download):
+        path = find_downloaded_file(SOULSEEK_DOWNLOADS_DIR, download['candidate'].filename)
+        if path:
+            record_stage(download, DOWNLOADED, path)
+            shared_downloads.deliver(track_key(download), path, download)
+            on_downloaded(download, path)
+            record_stage(download, ORGANIZED)
+        else:
+            logger.warning(f"Finished download not found on disk: {download['candidate'].filename}")
+        shared_downloads.release(track_key(download), download)
+
+    started = time.monotonic()
+    try:
+        result = track_transfers(owned, slskd.get_downloads, on_succeeded,
+                                 SLSKD_TRANSFER_TIMEOUT, SLSKD_TRANSFER_POLL_INTERVAL, failover=failover_download,
+                                 stall_window=SLSKD_STALL_WINDOW, min_rate=SLSKD_MIN_TRANSFER_RATE)
+    finally:
+        for download in owned:
+            shared_downloads.release(track_key(download), download)
+
+    for download in subscribed:
+        subscription = download['subscription']
+        path = subscription.wait(max(0.0, started + SLSKD_TRANSFER_TIMEOUT - time.monotonic()))
+        if path:
+            on_downloaded(download, path)
+            subscription.cleanup()
+            record_stage(download, ORGANIZED)
+        else:
+            logger.warning(f"Shared download did not arrive: {download['artist']} - {download['title']}")
+
+    return [local_download_path(SOULSEEK_DOWNLOADS_DIR, download['candidate'].filename)
+            for download in result['pending']]
+
+def other_jobs_downloads():
+    """Local paths of transfers other jobs are still tracking, which sweeps must leave alone"""
+    return [local_download_path(SOULSEEK_DOWNLOADS_DIR, download['candidate'].filename)
+            for download in shared_downloads.active_downloads()]
 
 # --- File Organization ---
 
-def cleanup_soulseek_dir():
-    """Clean up _Soulseek folder completely"""
+def cleanup_soulseek_dir(keep=()):
+    """Clean up _Soulseek folder, except files of transfers still in progress (`keep`)"""
     if not os.path.exists(SOULSEEK_DOWNLOADS_DIR):
         return
 
+    keep = {os.path.normpath(path) for path in keep}
     for root, dirs, files in os.walk(SOULSEEK_DOWNLOADS_DIR, topdown=False):
         for filename in files:
+            path = os.path.join(root, filename)
+            if os.path.normpath(path) in keep: continue
             try:
-                os.remove(os.path.join(root, filename))
+                os.remove(path)
             except Exception: pass
         for dirname in dirs:
             try:
+                # Fails (and is skipped) for folders still holding kept files
                 os.rmdir(os.path.join(root, dirname))
             except Exception: pass
     
-    logger.info("Cleaned up _Soulseek folder")
+    if keep:
+        logger.info(f"Cleaned up _Soulseek folder (kept {len(keep)} files still downloading)")
+    else:
+        logger.info("Cleaned up _Soulseek folder")
+
+def place_file(source_path, dest_path):
+    """Move a file without overwriting: hardlink + unlink on the same filesystem, copy + delete across devices"""
+    try:
+        os.link(source_path, dest_path)
+    except FileExistsError:
+        raise
+    except OSError:
+        # EXDEV (different mounts) or a filesystem without hardlinks
+        if os.path.exists(dest_path):
+            raise FileExistsError(dest_path)
+        shutil.copy2(source_path, dest_path)
+    os.remove(source_path)
+
+def organize_daily_file(source_path, expected, library_hashes=None):
+    """Move one downloaded file to Daily root as 'Artist - Title.mp3'; returns the new path or None
+
+    `expected` is an ExpectedTracks index of the tracks this file may be. Files whose audio payload is
+    already in the library (`library_hashes` from the library scan) are left out of Daily.
+    """
+    filename = os.path.basename(source_path)
+
+    if library_hashes:
+        try:
+            audio_hash = hash_audio(source_path)
+        except OSError:
+            audio_hash = None
+        if audio_hash in library_hashes:
+            logger.info(f"Same audio already in library, skipped: {filename} = {library_hashes[audio_hash]}")
+            return None
+
+    # Default: use filename as base
+    artist_candidate = ""
+    title_candidate = ""
+    
+    try:
+        artist_candidate, title_candidate = read_artist_title(source_path)
+    except Exception: pass
+    
+    matched_track = None
+    
+    # Check using ID3 tags first
+    if artist_candidate and title_candidate:
+        matched_track = expected.match_tags(artist_candidate, title_candidate)
+    
+    # If no match, check using filename
+    if not matched_track:
+        matched_track = expected.match_filename(filename, matches_track)
+    
+    if matched_track:
+        final_artist = matched_track['artist']
+        final_title = matched_track['title']
+    else:
+        logger.info(f"No Spotify match for {filename}, heuristic cleaning")
+        if artist_candidate and title_candidate:
+            final_artist = clean_string(artist_candidate)
+            final_title = clean_string(title_candidate)
+        else:
+            base = os.path.splitext(filename)[0]
+            if " - " in base:
+                parts = base.split(" - ", 1)
+                final_artist = clean_string(parts[0])
+                final_title = clean_string(parts[1])
+            else:
+                final_artist = "Unknown"
+                final_title = clean_string(base)
+
+    # Sanitize filename
+    final_artist = sanitize_filename(final_artist)
+    final_title = sanitize_filename(final_title)
+    new_filename = f"{final_artist} - {final_title}.mp3"
+    dest_path = os.path.join(DAILY_MUSIC_DIR, new_filename)
+
+    if os.path.exists(dest_path):
+        return None
+
+    try:
+        place_file(source_path, dest_path)
+        logger.info(f"Moved to Daily: {filename} -> {new_filename}")
+        return dest_path
+    except FileExistsError:
+        return None
+    except Exception as e:
+        logger.error(f"Error moving {source_path}: {e}")
+        return None
 
-def organize_daily_files(expected_tracks=[]):
-    """Process files from _Soulseek and move to Daily root with 'Artist - Title.mp3' format"""
+def organize_daily_files(expected_tracks=[], keep=(), library_hashes=None):
+    """Process files left in _Soulseek and move to Daily root with 'Artist - Title.mp3' format.
+
+    Files of transfers still in progress (`keep`) are neither organized nor deleted.
+    """
     if not os.path.exists(SOULSEEK_DOWNLOADS_DIR) or not os.path.exists(DAILY_MUSIC_DIR):
         return []
 
     moved_files = []
+    keep_paths = {os.path.normpath(path) for path in keep}
+    expected = ExpectedTracks(expected_tracks)
 
     for root, dirs, files in os.walk(SOULSEEK_DOWNLOADS_DIR):
         for filename in files:
             if not filename.lower().endswith('.mp3'): continue
 
             source_path = os.path.join(root, filename)
-            
-            # Default: use filename as base
-            artist_candidate = ""
-            title_candidate = ""
-            
-            try:
-                audio = MP3(source_path, ID3=ID3)
-                if audio.tags:
-                    if 'TPE1' in audio.tags: artist_candidate = str(audio.tags['TPE1'])
-                    if 'TIT2' in audio.tags: title_candidate = str(audio.tags['TIT2'])
-            except Exception: pass
-            
-            matched_track = None
-            
-            # Check using ID3 tags first
-            if artist_candidate and title_candidate:
-                for track in expected_tracks:
-                    if track['artist'].lower() in artist_candidate.lower() and \
-                       track['title'].lower() in title_candidate.lower():
-                        matched_track = track
-                        break
-            
-            # If no match, check using filename
-            if not matched_track:
-                for track in expected_tracks:
-                    if matches_track(filename, track['artist'], track['title']):
-                        matched_track = track
-                        break
-            
-            if matched_track:
-                final_artist = matched_track['artist']
-                final_title = matched_track['title']
-            else:
-                logger.info(f"No Spotify match for {filename}, heuristic cleaning")
-                if artist_candidate and title_candidate:
-                    final_artist = clean_string(artist_candidate)
-                    final_title = clean_string(title_candidate)
-                else:
-                    base = os.path.splitext(filename)[0]
-                    if " - " in base:
-                        parts = base.split(" - ", 1)
-                        final_artist = clean_string(parts[0])
-                        final_title = clean_string(parts[1])
-                    else:
-                        final_artist = "Unknown"
-                        final_title = clean_string(base)
-
-            # Sanitize filename
-            final_artist = re.sub(r'[<>:"/\\|?*]', '', final_artist).strip()
-            final_title = re.sub(r'[<>:"/\\|?*]', '', final_title).strip()
-            new_filename = f"{final_artist} - {final_title}.mp3"
-            dest_path = os.path.join(DAILY_MUSIC_DIR, new_filename)
-
-            if os.path.exists(dest_path):
-                continue
+            if os.path.normpath(source_path) in keep_paths: continue
 
-            try:
-                shutil.copy2(source_path, dest_path)
+            dest_path = organize_daily_file(source_path, expected, library_hashes)
+            if dest_path:
                 moved_files.append(dest_path)
-                logger.info(f"Copied to Daily: {filename} -> {new_filename}")
-            except Exception as e:
-                logger.error(f"Error copying {source_path}: {e}")
 
-    cleanup_soulseek_dir()
+    cleanup_soulseek_dir(keep)
     return moved_files
 
-def move_raw_files(destination_folder):
-    """Move all files from _Soulseek to destination WITHOUT renaming"""
+def move_raw_file(source_path, destination_folder):
+    """Move one file from _Soulseek to destination WITHOUT renaming; returns True if moved"""
+    filename = os.path.basename(source_path)
+    dest_path = os.path.join(destination_folder, filename)
+
+    # Avoid overwriting
+    if os.path.exists(dest_path):
+        base, ext = os.path.splitext(filename)
+        dest_path = os.path.join(destination_folder, f"{base}_{int(time.time())}{ext}")
+
+    try:
+        shutil.move(source_path, dest_path)
+        return True
+    except Exception as e:
+        logger.error(f"Error moving {filename}: {e}")
+        return False
+
+def move_raw_files(destination_folder, keep=()):
+    """Move all files from _Soulseek to destination WITHOUT renaming, except transfers still in progress (`keep`)"""
     if not os.path.exists(SOULSEEK_DOWNLOADS_DIR):
         return
     
@@ -351,87 +643,152 @@ def move_raw_files(destination_folder):
         os.makedirs(destination_folder)
 
     moved_count = 0
+    keep_paths = {os.path.normpath(path) for path in keep}
     for root, dirs, files in os.walk(SOULSEEK_DOWNLOADS_DIR):
         for filename in files:
             source_path = os.path.join(root, filename)
-            dest_path = os.path.join(destination_folder, filename)
-            
-            # Avoid overwriting
-            if os.path.exists(dest_path):
-                base, ext = os.path.splitext(filename)
-                dest_path = os.path.join(destination_folder, f"{base}_{int(time.time())}{ext}")
-
-            try:
-                shutil.move(source_path, dest_path)
+            if os.path.normpath(source_path) in keep_paths: continue
+            if move_raw_file(source_path, destination_folder):
                 moved_count += 1
-            except Exception as e:
-                logger.error(f"Error moving {filename}: {e}")
 
-    cleanup_soulseek_dir()
+    cleanup_soulseek_dir(keep)
     logger.info(f"Moved {moved_count} raw files to {destination_folder}")
 
+def desired_daily_tags(filename):
+    """Frame values every Daily file should carry, derived from its 'Artist - Title.mp3' name"""
+    base = os.path.splitext(filename)[0]
+    
+    # Extract artist and title
+    if " - " in base:
+        parts = base.split(" - ", 1)
+        final_artist = parts[0].strip()
+        final_title = parts[1].strip()
+    else:
+        final_artist = "Unknown"
+        final_title = base.strip()
+
+    return {
+        'TPE1': final_artist,       # Artist
+        'TIT2': final_title,        # Title
+        'TALB': "Daily Mix",        # Album
+        'TPE2': "Various Artists",  # Album Artist
+        'TCMP': "1",                # Compilation Flag
+    }
+
+def daily_tags_match(filepath, desired):
+    """True if the file already carries exactly the desired frame values"""
+    try:
+        frames = read_text_frames(filepath, desired.keys())
+    except (FastPathError, OSError, UnicodeDecodeError):
+        try:
+            tags = ID3(filepath)
+        except Exception:
+            return False
+        frames = {frame_id: str(tags[frame_id]) for frame_id in desired if frame_id in tags}
+    return frames == desired
+
+def rewrite_daily_tags(filepath, desired):
+    """Replace all tags except Album Art with the desired frames, preserving modification time"""
+    # Preserve original mtime
+    stat = os.stat(filepath)
+
+    audio = MP3(filepath, ID3=ID3)
+    
+    # Ensure tags exist
+    if audio.tags is None:
+        try:
+            audio.add_tags()
+        except Exception:
+            pass
+    
+    if audio.tags is None:
+        logger.warning(f"Could not initialize tags for {os.path.basename(filepath)}")
+        return False
+
+    # 1. Backup Album Art (APIC)
+    apic_frames = audio.tags.getall("APIC")
+    
+    # 2. Clear all tags
+    audio.tags.clear()
+    
+    # 3. Restore Album Art
+    for frame in apic_frames:
+        audio.tags.add(frame)
+
+    # 4. Set New Tags
+    for frame_class in (TPE1, TIT2, TALB, TPE2, TCMP):
+        audio.tags.add(frame_class(encoding=3, text=desired[frame_class.__name__]))
+    
+    audio.save()
+    
+    # Restore mtime (ns, so the manifest key stays exact)
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return True
+
+def update_daily_tag(filename):
+    """Bring one Daily file's tags in line; returns 'unchanged', 'updated' or 'failed'"""
+    filepath = os.path.join(DAILY_MUSIC_DIR, filename)
+    try:
+        desired = desired_daily_tags(filename)
+        if daily_tags_match(filepath, desired):
+            return 'unchanged'
+        return 'updated' if rewrite_daily_tags(filepath, desired) else 'failed'
+    except Exception as e:
+        logger.error(f"Error updating tags for {filepath}: {e}")
+        return 'failed'
+
+def load_tags_manifest():
+    if not os.path.exists(DAILY_TAGS_MANIFEST):
+        return {}
+    try:
+        with open(DAILY_TAGS_MANIFEST, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read {DAILY_TAGS_MANIFEST}: {e}")
+        return {}
+
 def update_daily_tags():
-    """Update tags for ALL files in Daily folder, preserving modification time and Album Art"""
+    """Update tags for ALL files in Daily folder, preserving modification time and Album Art.
+
+    Files listed in the manifest with the same size and mtime are not opened at all; the rest are
+    compared frame by frame and only rewritten when something differs, in a bounded worker pool.
+    """
     if not os.path.exists(DAILY_MUSIC_DIR): return
     
+    manifest = load_tags_manifest()
+    fingerprints = {}
+    to_check = []
     for filename in os.listdir(DAILY_MUSIC_DIR):
         if not filename.lower().endswith('.mp3'): continue
-        filepath = os.path.join(DAILY_MUSIC_DIR, filename)
-        
         try:
-            # Preserve original mtime
-            stat = os.stat(filepath)
-            original_atime = stat.st_atime
-            original_mtime = stat.st_mtime
+            stat = os.stat(os.path.join(DAILY_MUSIC_DIR, filename))
+        except OSError:
+            continue
+        fingerprints[filename] = [stat.st_size, stat.st_mtime_ns]
+        if manifest.get(filename) != fingerprints[filename]:
+            to_check.append(filename)
 
-            base = os.path.splitext(filename)[0]
-            
-            # Extract artist and title
-            if " - " in base:
-                parts = base.split(" - ", 1)
-                final_artist = parts[0].strip()
-                final_title = parts[1].strip()
-            else:
-                final_artist = "Unknown"
-                final_title = base.strip()
+    with ThreadPoolExecutor(max_workers=DAILY_TAG_WORKERS, thread_name_prefix="tags") as executor:
+        results = dict(zip(to_check, executor.map(update_daily_tag, to_check)))
 
-            audio = MP3(filepath, ID3=ID3)
-            
-            # Ensure tags exist
-            if audio.tags is None:
-                try:
-                    audio.add_tags()
-                except Exception:
-                    pass
-            
-            if audio.tags is None:
-                logger.warning(f"Could not initialize tags for {filename}")
-                continue
+    new_manifest = {}
+    for filename, fingerprint in fingerprints.items():
+        status = results.get(filename, 'unchanged')
+        if status == 'failed':
+            continue
+        if status == 'updated':
+            stat = os.stat(os.path.join(DAILY_MUSIC_DIR, filename))
+            fingerprint = [stat.st_size, stat.st_mtime_ns]
+        new_manifest[filename] = fingerprint
+    try:
+        write_json(DAILY_TAGS_MANIFEST, new_manifest)
+    except Exception as e:
+        logger.error(f"Could not write {DAILY_TAGS_MANIFEST}: {e}")
 
-            # 1. Backup Album Art (APIC)
-            apic_frames = audio.tags.getall("APIC")
-            
-            # 2. Clear all tags
-            audio.tags.clear()
-            
-            # 3. Restore Album Art
-            for frame in apic_frames:
-                audio.tags.add(frame)
-
-            # 4. Set New Tags
-            audio.tags.add(TPE1(encoding=3, text=final_artist)) # Artist
-            audio.tags.add(TIT2(encoding=3, text=final_title))  # Title
-            audio.tags.add(TALB(encoding=3, text="Daily Mix"))  # Album
-            audio.tags.add(TPE2(encoding=3, text="Various Artists")) # Album Artist
-            audio.tags.add(TCMP(encoding=3, text="1")) # Compilation Flag
-            
-            audio.save()
-            
-            # Restore mtime
-            os.utime(filepath, (original_atime, original_mtime))
-            
-        except Exception as e:
-            logger.error(f"Error updating tags for {filepath}: {e}")
+    updated = sum(1 for status in results.values() if status == 'updated')
+    failed = sum(1 for status in results.values() if status == 'failed')
+    logger.info(f"Daily tags: {len(fingerprints)} files, {len(fingerprints) - len(to_check)} skipped by manifest, "
+                f"{len(to_check) - updated - failed} already correct, {updated} rewritten, {failed} failed")
 
 def create_daily_playlist(library_files=[]):
     if not os.path.exists(DAILY_MUSIC_DIR): return
@@ -445,6 +802,26 @@ def create_daily_playlist(library_files=[]):
         for path in library_files: f.write(f"{path}\n")
         for filename in daily_files: f.write(f"{filename}\n")
 
+def create_playlist_m3u(name, tracks, library_paths):
+    """M3U for one source playlist: library paths and Daily files of its tracks, in playlist order"""
+    if not os.path.exists(DAILY_MUSIC_DIR): return
+    daily_files = sorted([f for f in os.listdir(DAILY_MUSIC_DIR) if f.lower().endswith('.mp3')])
+
+    entries = []
+    for track in tracks:
+        path = library_paths.get(track_key(track))
+        if not path:
+            path = next((f for f in daily_files if matches_track(f, track['artist'], track['title'])), None)
+        if path:
+            entries.append(path)
+    if not entries: return
+
+    playlist_path = os.path.join(DAILY_MUSIC_DIR, f"{sanitize_filename(name)}.m3u")
+    with open(playlist_path, 'w', encoding='utf-8') as f:
+        f.write("#EXTM3U\n")
+        for path in entries: f.write(f"{path}\n")
+    logger.info(f"Playlist '{name}': {len(entries)}/{len(tracks)} tracks available")
+
 def cleanup_old_daily_files():
     if not os.path.exists(DAILY_MUSIC_DIR): return
     cutoff = datetime.now() - timedelta(days=7)
@@ -458,9 +835,27 @@ def cleanup_old_daily_files():
 
 # --- Jobs ---
 
-def job_daily_sync():
-    logger.info("Starting Daily Sync Job...")
-    library_index = load_library_index()
+def log_run_stats():
+    """Log normalization cache and slskd API stats at the end of a job.
+
+    They are process-wide, so they are only reset when no other job is running; otherwise they keep
+    accumulating and the next job to finish alone reports and resets them.
+    """
+    others = jobs.running_count() - 1
+    shared = f" (shared with {others} running job(s))" if others > 0 else ""
+    logger.info(f"Normalization cache{shared}: {forms_cache_stats()}")
+    logger.info(f"Slskd API latency{shared}: {slskd.latency_stats()}")
+    if others <= 0:
+        clear_forms_cache()
+        slskd.reset_stats()
+
+def match_daily_tracks():
+    """Fetch the playlists and match them against Daily and the library.
+
+    Returns the sync state as stored in the journal: playlist_tracks, library_matches, library_paths,
+    tracks_to_download and to_search (tracks_to_download within DAILY_SEARCH_LIMIT).
+    """
+    library = open_library_store()
     library_matches = []
     
     # Scan Daily folder for existing tracks
@@ -468,13 +863,18 @@ def job_daily_sync():
     if os.path.exists(DAILY_MUSIC_DIR):
         daily_existing = [f for f in os.listdir(DAILY_MUSIC_DIR) if f.lower().endswith('.mp3')]
     
-    tracks = get_spotify_playlist_tracks(SPOTIFY_PLAYLIST_ID)
+    # Playlists are fetched concurrently; a track shared by several playlists is matched and searched once
+    jobs.report("fetching playlists")
+    playlist_tracks = fetch_playlists(SPOTIFY_PLAYLIST_IDS)
+    tracks = merge_playlist_tracks(playlist_tracks)
+    if len(playlist_tracks) > 1:
+        logger.info(f"{len(tracks)} unique tracks across {len(playlist_tracks)} playlists")
     tracks_to_download = []
+    # track_key -> library path, for the per-playlist M3Us
+    library_paths = {}
 
     for track in tracks:
-        a = re.sub(r'[<>:"/\\|?*]', '', clean_string(track['artist'])).strip()
-        t = re.sub(r'[<>:"/\\|?*]', '', clean_string(track['title'])).strip()
-        lookup_key = f"{a} - {t}".lower()
+        lookup_key = track_key(track)
         
         # 1. Check Daily Folder (Priority: Filename Match)
         found_in_daily = False
@@ -488,151 +888,316 @@ def job_daily_sync():
             continue
 
         # 2. Check Library (Exact Match)
-        if lookup_key in library_index:
-            library_matches.append(library_index[lookup_key]['path'])
+        exact_entry = library.get(lookup_key)
+        if exact_entry:
+            library_matches.append(exact_entry['path'])
+            library_paths[lookup_key] = exact_entry['path']
             continue
 
-        # 3. Check Library (Fuzzy Match)
-        found_fuzzy = False
-        for entry in library_index.values():
-            if matches_track(entry['canonical_name'], track['artist'], track['title']):
-                library_matches.append(entry['path'])
-                found_fuzzy = True
-                break
-        
-        if found_fuzzy:
+        # 3. Check Library (Fuzzy Match via token index / FTS)
+        fuzzy_entry = library.find_fuzzy(track['artist'], track['title'])
+        if fuzzy_entry:
+            library_matches.append(fuzzy_entry['path'])
+            library_paths[lookup_key] = fuzzy_entry['path']
             continue
             
         # 4. Not found anywhere -> Download
         tracks_to_download.append(track)
 
+    library.close()
+
     # Download limit to prevent huge queues
-    processed_count = 0
-    for track in tracks_to_download:
-        # Simple timeout protection for the job loop
-        if processed_count > 50: 
-            logger.info("Daily limit reached (50 tracks). Stopping.")
-            break
-            
+    if len(tracks_to_download) > DAILY_SEARCH_LIMIT:
+        logger.info(f"Daily limit reached ({DAILY_SEARCH_LIMIT} tracks). Skipping {len(tracks_to_download) - DAILY_SEARCH_LIMIT}.")
+    to_search = tracks_to_download[:DAILY_SEARCH_LIMIT]
+    for track in to_search:
         logger.info(f"Missing in library: {track['artist']} - {track['title']}")
-        if search_and_download_slskd(track['artist'], track['title']):
-             # Wait a bit between searches
-             time.sleep(5)
-        processed_count += 1
-
-    # Wait for downloads to finish if we downloaded anything
-    if processed_count > 0:
-        logger.info("Waiting for downloads (60s)...")
-        time.sleep(60)
-        # Organize only if we actually downloaded something
-        organize_daily_files(tracks_to_download)
+
+    return {
+        'playlist_tracks': playlist_tracks,
+        'library_matches': library_matches,
+        'library_paths': library_paths,
+        'tracks_to_download': tracks_to_download,
+        'to_search': to_search,
+    }
+
+def job_daily_sync():
+    logger.info("Starting Daily Sync Job...")
+    # An interrupted sync picks up where it stopped instead of fetching and matching everything again
+    run = journal.unfinished(DAILY_SYNC_JOB)
+    if run:
+        logger.info(f"Resuming the sync interrupted at {datetime.fromtimestamp(run['started']):%Y-%m-%d %H:%M}")
+        run_id, state = run['id'], run['data']
+    else:
+        state = match_daily_tracks()
+        to_search = state.pop('to_search')
+        run_id = journal.start(DAILY_SYNC_JOB, state, [(track_key(track), track) for track in to_search])
+
+    # Only a process restart resumes a run; one that raised starts over on the next sync
+    try:
+        sync_daily_tracks(run_id, state, resumed=bool(run))
+    except Exception:
+        journal.finish(run_id, "failed")
+        raise
+
+    # A playlist that could not be fetched was not synced, so the run doesn't count as a full sync
+    missing = [playlist for playlist, tracks in state['playlist_tracks'].items() if not tracks]
+    if missing:
+        logger.warning(f"Daily Sync Job finished without {len(missing)} playlist(s) that returned no tracks")
+        journal.finish(run_id, "incomplete")
+    else:
+        journal.finish(run_id)
+        logger.info("Daily Sync Job Completed.")
+
+def sync_daily_tracks(run_id, state, resumed):
+    """Search, download and organize the tracks of a daily sync run, then rebuild Daily's tags and playlists"""
+    playlist_tracks = state['playlist_tracks']
+    library_matches = state['library_matches']
+    library_paths = state['library_paths']
+    tracks_to_download = state['tracks_to_download']
+
+    journal_tracks = journal.tracks(run_id)
+    to_search = [{'artist': row['artist'], 'title': row['title']} for row in journal_tracks if row['stage'] == MATCHED]
+    restored = restore_downloads(run_id, journal_tracks)
+    if resumed:
+        logger.info(f"{len(to_search)} tracks left to search, {len(restored)} downloads to pick up again")
+
+    # Searches run concurrently; each queues its download as soon as it finds a match
+    jobs.report(f"searching {len(to_search)} tracks")
+    queued = [download for download in run_searches(to_search, journaled_search(run_id), SLSKD_MAX_CONCURRENT_SEARCHES)
+              if download] + restored
+    search_cache.save()
+    logger.info(f"Search cache: {search_cache.stats()}")
+
+    # Organize each download as soon as its transfer succeeds
+    if queued:
+        logger.info(f"Waiting for {len(queued)} downloads (up to {SLSKD_TRANSFER_TIMEOUT:.0f}s)...")
+        jobs.report(f"downloading {len(queued)} tracks")
+
+        with open_hash_index() as library_hashes:
+            in_progress = wait_for_downloads(
+                queued, lambda download, path: organize_daily_file(path, ExpectedTracks([download]), library_hashes))
+            # Sweep anything left over, keeping files of transfers still in progress
+            organize_daily_files(tracks_to_download, keep=in_progress + other_jobs_downloads(),
+                                 library_hashes=library_hashes)
     
     # Force update tags on ALL files in Daily (ensures consistency for old & new)
+    jobs.report("updating tags and playlists")
     update_daily_tags()
     
-    # Always recreate playlist
+    # Always recreate playlist, plus one M3U per source playlist when following several
     create_daily_playlist(library_matches)
+    if len(playlist_tracks) > 1:
+        for playlist, playlist_track_list in playlist_tracks.items():
+            create_playlist_m3u(spotify_playlists.name(playlist), playlist_track_list, library_paths)
     cleanup_old_daily_files()
     
-    logger.info("Daily Sync Job Completed.")
+    log_run_stats()
+
+def process_watch_file(filename):
+    """Download the tracks of one .txt (Spotify links) or .m3u/.m3u8 file from the watch folder"""
+    filepath = os.path.join(WATCH_DIR, filename)
+    playlist_name = os.path.splitext(filename)[0]
+    destination_dir = os.path.join(DOWNLOADS_ROOT, playlist_name)
+    job_name = f"watch {filename}"
+    
+    tracks = []
+    is_valid = False
 
-def process_watch_folder():
-    """Check watch folder for .txt or .m3u files"""
-    if not os.path.exists(WATCH_DIR):
+    try:
+        stat = os.stat(filepath)
+    except OSError:
         return
+    # The same file interrupted earlier resumes from the journal instead of being read and searched again
+    fingerprint = [stat.st_size, stat.st_mtime_ns]
+    run = journal.unfinished(job_name)
+    if run and run['data'].get('fingerprint') != fingerprint:
+        run = None
+
+    if run:
+        logger.info(f"Resuming interrupted playlist: {filename}")
+        tracks = run['data']['tracks']
+        is_valid = True
+
+    elif filename.endswith(".txt"):
+        try:
+            with open(filepath, 'r') as f:
+                # Expecting Spotify URIs or URLs, one per line
+                links = [line.strip() for line in f if "spotify" in line]
+                if links:
+                    logger.info(f"Found {len(links)} Spotify links in {filename}: {', '.join(links)}")
+                    playlist_tracks = fetch_playlists(links)
+                    # Spotify errors come back as empty playlists; don't mark the file processed without them
+                    missing = [link for link, link_tracks in playlist_tracks.items() if not link_tracks]
+                    if missing:
+                        retry_watch_file(filename, f"no tracks from {', '.join(missing)}")
+                        return
+                    tracks = merge_playlist_tracks(playlist_tracks)
+                    is_valid = True
+        except Exception as e:
+            logger.error(f"Error reading {filename}: {e}")
+            retry_watch_file(filename, str(e))
+            return
 
-    for filename in os.listdir(WATCH_DIR):
-        if filename.endswith(".processed"):
-            continue
+    elif filename.endswith(".m3u") or filename.endswith(".m3u8"):
+        try:
+            logger.info(f"Processing M3U playlist: {filename}")
+            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    line = line.strip()
+                    if line.startswith("#EXTINF"):
+                        # #EXTINF:123,Artist - Title
+                        parts = line.split(",", 1)
+                        if len(parts) > 1:
+                            meta = parts[1]
+                            if " - " in meta:
+                                a, t = meta.split(" - ", 1)
+                                tracks.append({'artist': a.strip(), 'title': t.strip()})
+                    elif not line.startswith("#") and line:
+                        # Try to guess from filename path
+                        base = os.path.basename(line)
+                        base = os.path.splitext(base)[0]
+                        if " - " in base:
+                            a, t = base.split(" - ", 1)
+                            tracks.append({'artist': a.strip(), 'title': t.strip()})
+            if tracks:
+                is_valid = True
+        except Exception as e:
+            logger.error(f"Error reading M3U {filename}: {e}")
 
-        filepath = os.path.join(WATCH_DIR, filename)
-        playlist_name = os.path.splitext(filename)[0]
-        destination_dir = os.path.join(DOWNLOADS_ROOT, playlist_name)
+    if is_valid and tracks:
+        logger.info(f"Starting manual download for '{playlist_name}' ({len(tracks)} tracks)")
         
-        tracks = []
-        is_valid = False
+        # Ensure destination exists
+        if not os.path.exists(destination_dir):
+            os.makedirs(destination_dir)
+
+        for track in tracks:
+            logger.info(f"Manual Download: {track['artist']} - {track['title']}")
+        if run:
+            run_id = run['id']
+        else:
+            run_id = journal.start(job_name, {'fingerprint': fingerprint, 'tracks': tracks},
+                                   [(track_key(track), track) for track in tracks])
+        # Only a process restart resumes a run; one that raised starts over when the file is next processed
+        try:
+            download_watch_tracks(run_id, bool(run), destination_dir)
+        except Exception:
+            journal.finish(run_id, "failed")
+            raise
 
-        if filename.endswith(".txt"):
-            try:
-                with open(filepath, 'r') as f:
-                    content = f.read().strip()
-                    # Expecting Spotify URI or URL
-                    if "spotify" in content:
-                        logger.info(f"Found Spotify link in {filename}: {content}")
-                        tracks = get_spotify_playlist_tracks(content)
-                        is_valid = True
-            except Exception as e:
-                logger.error(f"Error reading {filename}: {e}")
+        # Mark processed
+        try:
+            os.rename(filepath, filepath + ".processed")
+            logger.info(f"Finished processing {filename}")
+        except Exception as e:
+            logger.error(f"Error marking {filename} as processed: {e}")
+        journal.finish(run_id)
+        watch_failures.pop(filename, None)
+
+        log_run_stats()
+
+def retry_watch_file(filename, reason):
+    """Have the watcher report a watch file again later, backing off while it keeps failing"""
+    failures = watch_failures[filename] = watch_failures.get(filename, 0) + 1
+    delay = min(WATCH_RETRY_MAX, WATCH_POLL_INTERVAL * 2 ** min(failures - 1, 20))
+    logger.warning(f"Could not process {filename} ({reason}), retrying in {delay:.0f}s")
+    # The retry must not be taken for the watcher reporting a file the sweep already queued
+    swept_watch_files.pop(filename, None)
+    if watcher is not None:
+        watcher.retry(os.path.join(WATCH_DIR, filename), delay)
+
+def download_watch_tracks(run_id, resumed, destination_dir):
+    """Search and download the tracks of a watch folder run, moving each file to `destination_dir`"""
+    journal_tracks = journal.tracks(run_id)
+    to_search = [{'artist': row['artist'], 'title': row['title']} for row in journal_tracks if row['stage'] == MATCHED]
+    restored = restore_downloads(run_id, journal_tracks)
+    if resumed:
+        logger.info(f"{len(to_search)} tracks left to search, {len(restored)} downloads to pick up again")
+
+    jobs.report(f"searching {len(to_search)} tracks")
+    queued = [download for download in run_searches(to_search, journaled_search(run_id), SLSKD_MAX_CONCURRENT_SEARCHES)
+              if download] + restored
+    search_cache.save()
+    
+    # Move each file as soon as its transfer succeeds
+    logger.info(f"Waiting for {len(queued)} downloads to complete...")
+    jobs.report(f"downloading {len(queued)} tracks")
+    in_progress = wait_for_downloads(queued, lambda download, path: move_raw_file(path, destination_dir))
+    
+    # Move anything left over, keeping files of transfers still in progress
+    move_raw_files(destination_dir, keep=in_progress + other_jobs_downloads())
 
-        elif filename.endswith(".m3u") or filename.endswith(".m3u8"):
-            try:
-                logger.info(f"Processing M3U playlist: {filename}")
-                with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line.startswith("#EXTINF"):
-                            # #EXTINF:123,Artist - Title
-                            parts = line.split(",", 1)
-                            if len(parts) > 1:
-                                meta = parts[1]
-                                if " - " in meta:
-                                    a, t = meta.split(" - ", 1)
-                                    tracks.append({'artist': a.strip(), 'title': t.strip()})
-                        elif not line.startswith("#") and line:
-                            # Try to guess from filename path
-                            base = os.path.basename(line)
-                            base = os.path.splitext(base)[0]
-                            if " - " in base:
-                                a, t = base.split(" - ", 1)
-                                tracks.append({'artist': a.strip(), 'title': t.strip()})
-                if tracks:
-                    is_valid = True
-            except Exception as e:
-                logger.error(f"Error reading M3U {filename}: {e}")
+def submit_watch_file(filename):
+    jobs.submit('watch', f"watch {filename}", process_watch_file, filename)
 
-        if is_valid and tracks:
-            logger.info(f"Starting manual download for '{playlist_name}' ({len(tracks)} tracks)")
-            
-            # Ensure destination exists
-            if not os.path.exists(destination_dir):
-                os.makedirs(destination_dir)
-
-            for track in tracks:
-                logger.info(f"Manual Download: {track['artist']} - {track['title']}")
-                search_and_download_slskd(track['artist'], track['title'])
-                # Small delay between searches
-                time.sleep(2)
-            
-            # Allow time for last downloads
-            logger.info("Waiting for downloads to complete...")
-            time.sleep(20)
-            
-            # Move files
-            move_raw_files(destination_dir)
-            
-            # Mark processed
-            try:
-                os.rename(filepath, filepath + ".processed")
-                logger.info(f"Finished processing {filename}")
-            except Exception as e:
-                logger.error(f"Error marking {filename} as processed: {e}")
+def submit_daily_sync():
+    jobs.submit('sync', DAILY_SYNC_JOB, job_daily_sync)
+
+def watch_file_fingerprint(filepath):
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def process_watch_folder():
+    """Queue every playlist file in the watch folder (not yet marked .processed), noting each in swept_watch_files"""
+    if not os.path.exists(WATCH_DIR):
+        return
+
+    for filename in sorted(os.listdir(WATCH_DIR)):
+        # Same files the watcher reports; skips .processed ones, cover images, editor swap files...
+        if not filename.endswith(WATCH_EXTENSIONS):
+            continue
+        # Before submitting: a job that fails at once drops it again to be retried
+        swept_watch_files[filename] = watch_file_fingerprint(os.path.join(WATCH_DIR, filename))
+        submit_watch_file(filename)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spotify -> Soulseek -> Navidrome bridge service")
+    parser.add_argument("--force-search", action="store_true",
+                        help="Ignore the search cache and search every missing track again")
+    args = parser.parse_args()
+    search_cache.force = args.force_search
+
     logger.info("Bridge Service Started with Manual Watch Support.")
     
-    # Run Daily Sync on startup
-    job_daily_sync()
+    # Daily syncs and watch-folder playlists run on separate lanes, so neither waits for the other
+    jobs.start()
+
+    # Run Daily Sync on startup, unless a full sync finished recently (an interrupted one is resumed)
+    last_sync = journal.last_completed(DAILY_SYNC_JOB)
+    if (args.force_search or journal.unfinished(DAILY_SYNC_JOB) or not last_sync
+            or time.time() - last_sync > STARTUP_SYNC_SKIP_HOURS * 3600):
+        submit_daily_sync()
+    else:
+        logger.info(f"Skipping startup sync, last full sync finished at {datetime.fromtimestamp(last_sync):%Y-%m-%d %H:%M}")
     
     # Schedule Daily Sync every day at 05:00
-    schedule.every().day.at("05:00").do(job_daily_sync)
+    schedule.every().day.at("05:00").do(submit_daily_sync)
     
-    # Main loop
+    # Start watching before the catch-up sweep, so a file written in between is not missed
+    watcher = WatchFolder(WATCH_DIR, WATCH_EXTENSIONS, debounce=WATCH_DEBOUNCE, poll_interval=WATCH_POLL_INTERVAL,
+                          mode=WATCH_MODE)
+    # Pick up files dropped while the service was down
+    try:
+        process_watch_folder()
+    except Exception as e:
+        logger.error(f"Error in watch loop: {e}")
+
+    # Main loop: sleep until a watch file is ready or the next scheduled job is due
     while True:
-        # Check watch folder frequently (every 10 seconds)
+        idle = schedule.idle_seconds()
+        timeout = 3600.0 if idle is None else min(max(idle, 0.0), 3600.0)
         try:
-            process_watch_folder()
+            for path in watcher.wait(timeout):
+                filename = os.path.basename(path)
+                # Reported by both the sweep and the watcher: only queue it again if it changed since
+                if swept_watch_files.pop(filename, False) == watch_file_fingerprint(path):
+                    continue
+                submit_watch_file(filename)
         except Exception as e:
             logger.error(f"Error in watch loop: {e}")
-            
+
         schedule.run_pending()
-        time.sleep(10)
\ No newline at end of file
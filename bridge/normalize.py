@@ -0,0 +1,72 @@
+import os
+import re
+from functools import lru_cache
+from collections import namedtuple
+from unidecode import unidecode
+
+# Words that mark clutter like (Radio Edit), [Remastered Version], (Ft. Someone)
+# Use word boundaries (\b) to prevent matching parts of words (e.g. 'ver' in 'Cover')
+KEYWORDS = r"\bradio\b|\bedit\b|\bmix\b|\bremix\b|\bremaster\b|\bfeat\b|\bft\.?|\bfeature\b|\bextended\b|\bclub\b|\boriginal\b|\bvocal\b|\bversion\b"
+
+# Text inside brackets/parentheses containing keywords.
+# Hex codes avoid backslash/bracket escaping issues: \x29 = ), \x5D = ], [^\x29\x5D] means "not ) or ]".
+# A group can't contain a closing bracket, so removing one never creates another: a single pass
+# reaches the same fixed point the old "re.sub until nothing changes" loop did.
+BRACKET_CLUTTER_RE = re.compile(r'\s*[(\[][^\x29\x5D]*?(?:' + KEYWORDS + r')[^\x29\x5D]*?[)\x5D]', re.IGNORECASE)
+# Trailing " - Radio Edit" etc patterns (no brackets)
+TRAILING_CLUTTER_RE = re.compile(r'\s*-\s*.*?(?:' + KEYWORDS + r').*?$', re.IGNORECASE)
+# "Ft. Artist" (no brackets)
+FEAT_RE = re.compile(r'\s+(?:feat|ft\.|feature)\.?\s+.*$', re.IGNORECASE)
+
+# Bounded so the long-running bridge process stays flat; cleared after every job
+FORMS_CACHE_SIZE = int(os.getenv("FORMS_CACHE_SIZE", "50000"))
+
+NON_WORD_RE = re.compile(r'[^\w\s]')
+INVALID_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+
+# clean: clutter removed, norm: normalize_string(), uni: normalize_string(unidecode())
+Forms = namedtuple('Forms', ['clean', 'norm', 'uni'])
+
+def clean_string(text):
+    """Remove common clutter from strings like (Radio Edit), (Ft. ...), etc."""
+    if not text:
+        return ""
+    text = BRACKET_CLUTTER_RE.sub('', text)
+    text = TRAILING_CLUTTER_RE.sub('', text)
+    text = FEAT_RE.sub('', text)
+    return text.strip()
+
+def sanitize_filename(text):
+    """Remove characters that are invalid in file names"""
+    return INVALID_FILENAME_RE.sub('', text).strip()
+
+def normalize_string(s):
+    """Normalize string for matching: lowercase, remove special chars, single spaces"""
+    # str.split() collapses the same whitespace as \s+ and drops it at both ends
+    return ' '.join(NON_WORD_RE.sub(' ', s.lower()).split())
+
+def normalize_transliterated(s):
+    """normalize_string(unidecode(s)); ASCII input is returned as is by unidecode, so skip it"""
+    if s.isascii():
+        return normalize_string(s)
+    return normalize_string(unidecode(s))
+
+def forms(text):
+    """Clean, normalized and transliterated forms of a raw string in one call"""
+    norm = normalize_string(text)
+    uni = norm if text.isascii() else normalize_string(unidecode(text))
+    return Forms(clean_string(text), norm, uni)
+
+@lru_cache(maxsize=FORMS_CACHE_SIZE)
+def cached_forms(text):
+    """forms() memoized by raw string (LRU, thread-safe)"""
+    return forms(text)
+
+def forms_cache_stats():
+    info = cached_forms.cache_info()
+    lookups = info.hits + info.misses
+    hit_rate = info.hits / lookups * 100 if lookups else 0.0
+    return f"{info.hits} hits, {info.misses} misses ({hit_rate:.0f}% hit rate), {info.currsize}/{info.maxsize} entries"
+
+def clear_forms_cache():
+    cached_forms.cache_clear()
@@ -0,0 +1,66 @@
+import re
+from unidecode import unidecode
+from normalize import cached_forms
+
+# Joiners between several artists in one name: "A, B", "A & B", "A feat. B", "A x B", "A vs. B"
+ARTIST_SEPARATOR_RE = re.compile(r'\s*(?:,|;|&|\s+(?:feat\.?|ft\.|featuring|x|vs\.?|with)\s+)\s*', re.IGNORECASE)
+# Title-only searches with shorter titles ("Intro", "Home") flood the results
+TITLE_ONLY_MIN_LENGTH = 8
+
+def primary_artist(artist):
+    """First artist of a combined artist string"""
+    return ARTIST_SEPARATOR_RE.split(artist, 1)[0].strip() or artist
+
+def plan_queries(artist, title):
+    """Search text variants for a track, most specific first, without duplicates.
+
+    Returns [(label, query)]: the raw "artist title", then cleaned, transliterated, primary-artist-only
+    and title-only variants (results are always matched against the artist, so title-only stays safe).
+    """
+    clean_artist = cached_forms(artist).clean or artist
+    clean_title = cached_forms(title).clean or title
+    main_artist = primary_artist(clean_artist)
+
+    variants = [
+        ("raw", f"{artist} {title}"),
+        ("cleaned", f"{clean_artist} {clean_title}"),
+        ("transliterated", unidecode(f"{clean_artist} {clean_title}")),
+        ("primary artist", f"{main_artist} {clean_title}"),
+    ]
+    if len(clean_title) >= TITLE_ONLY_MIN_LENGTH:
+        variants.append(("title only", clean_title))
+
+    queries = []
+    seen = set()
+    for label, query in variants:
+        query = ' '.join(query.split())
+        if query and query.lower() not in seen:
+            seen.add(query.lower())
+            queries.append((label, query))
+    return queries
+
+def match_names(artist, title):
+    """(artist, title) pairs a result file may match: as given, cleaned, and with the primary artist only"""
+    clean_artist = cached_forms(artist).clean or artist
+    clean_title = cached_forms(title).clean or title
+    names = []
+    for pair in ((artist, title), (clean_artist, clean_title), (primary_artist(clean_artist), clean_title)):
+        if pair not in names:
+            names.append(pair)
+    return names
+
+def merge_responses(response_lists):
+    """Merge search responses from several queries: one entry per user, each file once"""
+    merged = {}
+    seen = {}
+    for responses in response_lists:
+        for user_response in responses:
+            username = user_response.get('username')
+            if username not in merged:
+                merged[username] = dict(user_response, files=[])
+                seen[username] = set()
+            for file in user_response.get('files', []):
+                if file.get('filename') not in seen[username]:
+                    seen[username].add(file.get('filename'))
+                    merged[username]['files'].append(file)
+    return list(merged.values())
@@ -1,49 +1,60 @@
 import os
 import json
+import argparse
+import queue
+import threading
 import logging
-import re
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3
+from id3_reader import read_artist_title
+from audio_hash import LIBRARY_HASH_INDEX_PATH, hash_audio
+from normalize import clean_string, sanitize_filename
+from library_store import (LIBRARY_INDEX_PATH, LIBRARY_DB_PATH, LIBRARY_BACKEND, INDEX_VERSION,
+                           SqliteLibraryStore, add_normalized_forms, read_library_index, write_json)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 LIBRARY_PATHS = ["/music/Music", "/music/Музыка"]
-OUTPUT_FILE = "/music/library_index.json"
+SCAN_STATE_FILE = "/music/library_scan_state.json"
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "1"))
+# Hash the audio payload of every file for content-based duplicate checks (cached in the scan state)
+SCAN_AUDIO_HASH = os.getenv("SCAN_AUDIO_HASH", "1") == "1"
 
-def clean_string(text):
-    """Remove common clutter from strings like (Radio Edit), (Ft. ...), etc."""
-    if not text:
-        return ""
+def read_track_tags(filepath):
+    """Read ID3 tags and return cleaned (artist, title), empty strings if tags are missing"""
+    artist, title = read_artist_title(filepath)
     
-    # 1. Remove text inside brackets/parentheses containing keywords
-    # Use word boundaries (\b) to prevent matching parts of words (e.g. 'ver' in 'Cover')
-    keywords = r"\bradio\b|\bedit\b|\bmix\b|\bremix\b|\bremaster\b|\bfeat\b|\bft\.?|\bfeature\b|\bextended\b|\bclub\b|\boriginal\b|\bvocal\b|\bversion\b"
-    
-    # Use hex codes to avoid backslash/bracket escaping issues
-    # \x29 = )
-    # \x5D = ]
-    # [^\x29\x5D] means "not ) or ]"
-    pattern = r'\s*[(\[][^\x29\x5D]*?(?:' + keywords + r')[^\x29\x5D]*?[)\x5D]'
+    if not (artist and title):
+        return "", ""
+
+    # Clean and format
+    clean_artist = clean_string(artist)
+    clean_title = clean_string(title)
     
-    prev_text = None
-    while text != prev_text:
-        prev_text = text
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+    # Remove invalid characters for the key
+    clean_artist = sanitize_filename(clean_artist)
+    clean_title = sanitize_filename(clean_title)
+    return clean_artist, clean_title
 
-    # 2. Remove trailing " - Radio Edit" etc patterns (no brackets)
-    text = re.sub(r'\s*-\s*.*?(?:' + keywords + r').*?$', '', text, flags=re.IGNORECASE)
+def file_fingerprint(st):
+    """Stat fingerprint used to detect changed files between scans"""
+    return {"size": st.st_size, "mtime": st.st_mtime_ns, "inode": st.st_ino}
 
-    # 3. Remove "Ft. Artist" (no brackets)
-    text = re.sub(r'\s+(?:feat|ft\.|feature)\.?\s+.*$', '', text, flags=re.IGNORECASE)
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read {path}: {e}")
+        return default
 
-    return text.strip()
+def iter_scan_tasks(previous_for, full, with_hash=False):
+    """Walk library folders and yield one task per MP3 (in walk order) with its stat fingerprint.
 
-def scan_library():
-    logger.info("Starting library scan...")
-    library_index = {}
-    
+    previous_for(path) returns the file's state from the previous run, or None.
+    """
     for library_path in LIBRARY_PATHS:
         if not os.path.exists(library_path):
             logger.warning(f"Path not found: {library_path}")
@@ -55,48 +66,223 @@ def scan_library():
                     continue
                 
                 filepath = os.path.join(root, filename)
-                
+
                 try:
-                    audio = MP3(filepath, ID3=ID3)
-                    artist = ""
-                    title = ""
-                    
-                    if audio.tags:
-                        if 'TPE1' in audio.tags:
-                            artist = str(audio.tags['TPE1'])
-                        if 'TIT2' in audio.tags:
-                            title = str(audio.tags['TIT2'])
-                    
-                    if artist and title:
-                        # Clean and format
-                        clean_artist = clean_string(artist)
-                        clean_title = clean_string(title)
-                        
-                        # Remove invalid characters for the key
-                        clean_artist = re.sub(r'[<>:"/\\|?*]', '', clean_artist).strip()
-                        clean_title = re.sub(r'[<>:"/\\|?*]', '', clean_title).strip()
-                        
-                        # Create the canonical key: "Artist - Title"
-                        # We use this to match against Spotify requirements
-                        # Note: We store lowercase for case-insensitive matching
-                        key = f"{clean_artist} - {clean_title}".lower()
-                        
-                        # Store the real path
-                        library_index[key] = {
-                            "path": filepath,
-                            "original_filename": filename,
-                            "canonical_name": f"{clean_artist} - {clean_title}.mp3"
-                        }
-                        
-                except Exception as e:
+                    fingerprint = file_fingerprint(os.stat(filepath))
+                except OSError as e:
                     logger.debug(f"Error reading {filepath}: {e}")
-                    
-    logger.info(f"Scan complete. Found {len(library_index)} unique tracks.")
-    
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(library_index, f, ensure_ascii=False, indent=2)
-    
-    logger.info(f"Index saved to {OUTPUT_FILE}")
+                    continue
+
+                previous = previous_for(filepath)
+                unchanged = previous is not None and all(previous.get(k) == v for k, v in fingerprint.items())
+                yield {
+                    "path": filepath,
+                    "filename": filename,
+                    "fingerprint": fingerprint,
+                    "previous": previous,
+                    "unchanged": unchanged,
+                    "read": full or not unchanged,
+                    # Unchanged files keep their cached hash; older state files have none yet
+                    "hash": with_hash and (not unchanged or 'audio_hash' not in previous),
+                }
+
+def run_scan_task(task):
+    """Read tags for a task if needed (worker side); errors are stored on the task"""
+    if task['read']:
+        try:
+            task['tags'] = read_track_tags(task['path'])
+        except Exception as e:
+            task['error'] = e
+    if task['hash'] and 'error' not in task:
+        try:
+            task['audio_hash'] = hash_audio(task['path'])
+        except Exception as e:
+            logger.debug(f"Error hashing {task['path']}: {e}")
+    return task
+
+def iter_scanned_parallel(tasks, workers):
+    """Run tag reads in a worker pool fed from a bounded queue, yielding results in walk order"""
+    window = workers * 4
+    path_queue = queue.Queue(maxsize=window)
+    in_flight = threading.BoundedSemaphore(window)
+    results = {}
+    walk_state = {"total": None, "error": None}
+    done = threading.Condition()
+
+    def walker():
+        count = 0
+        try:
+            for task in tasks:
+                in_flight.acquire()
+                path_queue.put((count, task))
+                count += 1
+        except Exception as e:
+            walk_state['error'] = e
+        finally:
+            for _ in range(workers):
+                path_queue.put(None)
+            with done:
+                walk_state['total'] = count
+                done.notify_all()
+
+    def worker():
+        while True:
+            item = path_queue.get()
+            if item is None:
+                break
+            seq, task = item
+            run_scan_task(task)
+            with done:
+                results[seq] = task
+                done.notify_all()
+
+    threads = [threading.Thread(target=walker, daemon=True)]
+    threads += [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    # Single writer: hand results back strictly in sequence so key collisions resolve like a sequential scan
+    next_seq = 0
+    while True:
+        with done:
+            while next_seq not in results and walk_state['total'] != next_seq:
+                done.wait()
+            if next_seq not in results:
+                break
+            task = results.pop(next_seq)
+        in_flight.release()
+        next_seq += 1
+        yield task
+
+    for thread in threads:
+        thread.join()
+    if walk_state['error']:
+        raise walk_state['error']
+
+def scan_library(full=False, workers=1, backend=LIBRARY_BACKEND, with_hash=SCAN_AUDIO_HASH):
+    logger.info(f"Starting library scan ({'full' if full else 'incremental'}, {workers} workers, {backend}"
+                f"{', audio hashes' if with_hash else ''})...")
+    library_index = {}
+    store = SqliteLibraryStore(LIBRARY_DB_PATH) if backend == "sqlite" else None
+
+    # Per-file state from the previous run: {path: {size, mtime, inode, artist, title}}
+    previous_entry_for = lambda key: None
+    if store is not None:
+        # Kept in the database and updated row by row; a JSON state from an earlier json-backend scan seeds it once
+        if store.file_count() == 0 and os.path.exists(SCAN_STATE_FILE):
+            store.import_file_states(load_json(SCAN_STATE_FILE, {}))
+        previous_for = store.file_state
+        store.begin_scan()
+    else:
+        previous_state = load_json(SCAN_STATE_FILE, {})
+        previous_for = previous_state.get
+        if not full and previous_state and os.path.exists(LIBRARY_INDEX_PATH):
+            try:
+                previous_entry_for = read_library_index(LIBRARY_INDEX_PATH).get
+            except Exception as e:
+                logger.warning(f"Could not read previous index, recomputing entries: {e}")
+
+    state = {}
+    # audio hash -> first path in walk order
+    hash_index = {}
+    added = changed = upserted = 0
+
+    tasks = iter_scan_tasks(previous_for, full, with_hash)
+    if workers > 1:
+        scanned = iter_scanned_parallel(tasks, workers)
+    else:
+        scanned = (run_scan_task(task) for task in tasks)
+
+    for file_position, task in enumerate(scanned):
+        filepath, previous, unchanged = task['path'], task['previous'], task['unchanged']
+
+        if not task['read']:
+            record = previous
+        else:
+            if previous is None:
+                added += 1
+            elif not unchanged:
+                changed += 1
+            if 'error' in task:
+                # Not stored in state, so the file is retried on the next run
+                logger.debug(f"Error reading {filepath}: {task['error']}")
+                continue
+            clean_artist, clean_title = task['tags']
+            record = dict(task['fingerprint'], artist=clean_artist, title=clean_title)
+
+        if task['hash']:
+            record = dict(record)
+            record.pop('audio_hash', None)
+            if task.get('audio_hash'):
+                record['audio_hash'] = task['audio_hash']
+        elif unchanged and previous.get('audio_hash') and 'audio_hash' not in record:
+            # Full rescan of an unchanged file: the payload hash is still valid
+            record['audio_hash'] = previous['audio_hash']
+        if store is not None:
+            store.scan_file(filepath, file_position, record, previous)
+        else:
+            if with_hash and record.get('audio_hash'):
+                hash_index.setdefault(record['audio_hash'], filepath)
+            state[filepath] = record
+        clean_artist, clean_title = record['artist'], record['title']
+        if not (clean_artist and clean_title):
+            continue
+
+        # Create the canonical key: "Artist - Title"
+        # We use this to match against Spotify requirements
+        # Note: We store lowercase for case-insensitive matching
+        key = f"{clean_artist} - {clean_title}".lower()
+        new_entry = lambda: add_normalized_forms({
+            "path": filepath,
+            "original_filename": task['filename'],
+            "canonical_name": f"{clean_artist} - {clean_title}.mp3",
+            "artist": clean_artist,
+            "title": clean_title
+        })
+
+        if store is not None:
+            # Streamed into the database; only rows that changed are written
+            if store.scan_track(key, filepath, f"{clean_artist} - {clean_title}.mp3", new_entry):
+                upserted += 1
+            continue
+
+        # Reuse the previous entry (with its normalized forms) for unchanged files
+        previous_entry = previous_entry_for(key)
+        if unchanged and previous_entry and previous_entry.get('path') == filepath:
+            library_index[key] = previous_entry
+            continue
+
+        # Store the real path
+        library_index[key] = new_entry()
+
+    if store is not None:
+        # Scan state, audio hashes and index all live in the database, committed in one transaction
+        tracks = store.scan_positions
+        deleted, removed = store.finish_scan()
+        store.close()
+        logger.info(f"Scan complete. Found {tracks} unique tracks "
+                    f"({added} added, {changed} changed, {removed} removed files).")
+        logger.info(f"Index saved to {LIBRARY_DB_PATH} ({upserted} upserted, {deleted} deleted)")
+        return {"added": added, "changed": changed, "removed": removed, "tracks": tracks}
+
+    removed = len(set(previous_state) - set(state))
+    tracks = len(library_index)
+    logger.info(f"Scan complete. Found {tracks} unique tracks "
+                f"({added} added, {changed} changed, {removed} removed files).")
+    write_json(LIBRARY_INDEX_PATH, {"version": INDEX_VERSION, "tracks": library_index})
+    logger.info(f"Index saved to {LIBRARY_INDEX_PATH}")
+    if with_hash:
+        write_json(LIBRARY_HASH_INDEX_PATH, hash_index)
+        logger.info(f"Hash index saved to {LIBRARY_HASH_INDEX_PATH} ({len(hash_index)} distinct audio payloads)")
+    write_json(SCAN_STATE_FILE, state)
+    return {"added": added, "changed": changed, "removed": removed, "tracks": tracks}
 
 if __name__ == "__main__":
-    scan_library()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the library index used by the bridge")
+    parser.add_argument("--full", action="store_true", help="Re-read tags of every file instead of only new/changed ones")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS, help="Parallel tag reader threads (default: SCAN_WORKERS or 1)")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default=LIBRARY_BACKEND, help="Index store to write (default: LIBRARY_BACKEND or json)")
+    parser.add_argument("--no-hash", action="store_true", help="Skip audio hashing (default: SCAN_AUDIO_HASH=1 hashes)")
+    args = parser.parse_args()
+    scan_library(full=args.full, workers=max(1, args.workers), backend=args.backend,
+                 with_hash=SCAN_AUDIO_HASH and not args.no_hash)
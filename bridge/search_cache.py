@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import logging
+import threading
+from normalize import cached_forms
+from library_store import write_json
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "/music/search_cache.json")
+# A miss is not searched again for NEGATIVE_TTL hours, doubling with every repeated miss up to MAX_BACKOFF
+SEARCH_CACHE_NEGATIVE_TTL = float(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "20")) * 3600
+SEARCH_CACHE_MAX_BACKOFF = float(os.getenv("SEARCH_CACHE_MAX_BACKOFF", "336")) * 3600
+# Candidates of a successful search are reused instead of searching again for POSITIVE_TTL hours
+SEARCH_CACHE_POSITIVE_TTL = float(os.getenv("SEARCH_CACHE_POSITIVE_TTL", "6")) * 3600
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+SEARCH_CACHE_CANDIDATES = 5
+
+# Outcomes of a search; everything but QUEUED counts as a miss
+QUEUED = "queued"
+NO_RESULTS = "no_results"
+NO_MATCH = "no_match"
+
+def cache_key(artist, title):
+    return f"{cached_forms(artist).norm} - {cached_forms(title).norm}"
+
+class SearchCache:
+    """On-disk record of past searches: when, with what outcome and the best candidates found.
+
+    Shared by concurrent searches (updates are locked); save() writes it back atomically.
+    With force=True nothing is skipped or reused, but outcomes are still recorded.
+    """
+
+    def __init__(self, path=SEARCH_CACHE_PATH, force=False):
+        self.path = path
+        self.force = force
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.skipped = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('entries', {})
+        except Exception as e:
+            logger.warning(f"Could not read search cache {self.path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        with self.lock:
+            self._evict()
+            data = {'entries': dict(self.entries)}
+        try:
+            write_json(self.path, data)
+        except Exception as e:
+            logger.error(f"Could not write search cache {self.path}: {e}")
+
+    def _evict(self):
+        """Drop the oldest searches beyond SEARCH_CACHE_MAX_ENTRIES"""
+        excess = len(self.entries) - SEARCH_CACHE_MAX_ENTRIES
+        if excess <= 0:
+            return
+        oldest = sorted(self.entries, key=lambda key: self.entries[key]['searched_at'])[:excess]
+        for key in oldest:
+            del self.entries[key]
+
+    def should_skip(self, artist, title):
+        """True if a recent miss for this track is still inside its back-off window"""
+        if self.force:
+            return False
+        entry = self.entries.get(cache_key(artist, title))
+        if not entry or entry['outcome'] == QUEUED:
+            return False
+        backoff = min(SEARCH_CACHE_NEGATIVE_TTL * 2 ** (entry['misses'] - 1), SEARCH_CACHE_MAX_BACKOFF)
+        if time.time() - entry['searched_at'] < backoff:
+            with self.lock:
+                self.skipped += 1
+            return True
+        return False
+
+    def recent_candidates(self, artist, title):
+        """Candidates (dicts) of a successful search made within SEARCH_CACHE_POSITIVE_TTL, best first"""
+        if self.force:
+            return []
+        entry = self.entries.get(cache_key(artist, title))
+        if not entry or entry['outcome'] != QUEUED:
+            return []
+        if time.time() - entry['searched_at'] >= SEARCH_CACHE_POSITIVE_TTL:
+            return []
+        return entry.get('candidates', [])
+
+    def record(self, artist, title, outcome, candidates=()):
+        key = cache_key(artist, title)
+        with self.lock:
+            previous = self.entries.get(key)
+            misses = 0
+            if outcome != QUEUED:
+                misses = (previous['misses'] if previous else 0) + 1
+            self.entries[key] = {
+                'searched_at': time.time(),
+                'outcome': outcome,
+                'misses': misses,
+                'candidates': [candidate._asdict() for candidate in candidates[:SEARCH_CACHE_CANDIDATES]],
+            }
+
+    def stats(self):
+        misses = sum(1 for entry in self.entries.values() if entry['outcome'] != QUEUED)
+        return f"{len(self.entries)} tracks cached ({misses} misses), {self.skipped} searches skipped"
@@ -0,0 +1,51 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """Spaces out calls so no more than `per_minute` start in any minute, shared by all threads"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+def run_searches(tracks, search, max_in_flight):
+    """Run search(track) for every track with up to `max_in_flight` running at once.
+
+    Results are collected as searches complete and returned in the order of `tracks`.
+    A search that raises counts as a failed search (None).
+    """
+    results = [None] * len(tracks)
+    if not tracks:
+        return results
+
+    started = time.monotonic()
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="search") as executor:
+        futures = {executor.submit(search, track): i for i, track in enumerate(tracks)}
+        for future in as_completed(futures):
+            i = futures[future]
+            track = tracks[i]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                logger.error(f"Search failed for {track['artist']} - {track['title']}: {e}")
+            done += 1
+            logger.debug(f"Search progress: {done}/{len(tracks)}")
+
+    found = sum(1 for result in results if result)
+    logger.info(f"Searched {len(tracks)} tracks in {time.monotonic() - started:.0f}s "
+                f"({max_in_flight} in flight): {found} queued for download")
+    return results
@@ -0,0 +1,135 @@
+import os
+import uuid
+import shutil
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """A track another job is downloading; path is our own copy of the file once it arrived (None if it didn't)"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.path = None
+
+    def wait(self, timeout):
+        self.event.wait(timeout)
+        return self.path
+
+    def cleanup(self):
+        """Remove what is left of the handed-off file after it was processed"""
+        if self.path:
+            shutil.rmtree(os.path.dirname(self.path), ignore_errors=True)
+
+class _Entry:
+    def __init__(self):
+        self.searched = threading.Event()
+        self.download = None
+        self.subscribers = []
+
+class SharedDownloads:
+    """Lets jobs running at the same time share one search and download of a track.
+
+    The first job asking for a track owns it: it runs the search and tracks the transfer. A job asking
+    for the same track meanwhile subscribes instead and, once the owner's transfer succeeds, gets its
+    own copy of the file in `handoff_dir`. It is a real copy, not a hard link: the owner may link its
+    file into Daily and rewrite the tags in place, which must not change the subscriber's file. The
+    owner must call deliver() before moving the file and release() when it is done with the track,
+    whatever the outcome.
+    """
+
+    def __init__(self, handoff_dir):
+        self.handoff_dir = handoff_dir
+        self.lock = threading.Lock()
+        self.entries = {}
+        # Adopted downloads another job already owned the key of; tracked by their job alone
+        self.private = []
+
+    def acquire(self, key, search):
+        """Run search() for `key` unless another job already is.
+
+        Returns the owner's download (or None), or {'subscription': Subscription} if the track is
+        already being fetched by another job.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self.entries[key] = _Entry()
+            else:
+                subscription = Subscription()
+                entry.subscribers.append(subscription)
+
+        if not owner:
+            entry.searched.wait()
+            return {'subscription': subscription} if entry.download else None
+
+        try:
+            entry.download = search()
+        finally:
+            entry.searched.set()
+            if not entry.download:
+                self.release(key)
+        return entry.download
+
+    def adopt(self, key, download):
+        """Own a download queued before a restart, without searching.
+
+        Its transfer already exists in slskd, so it is never coalesced into another job's. If another job
+        owns `key` by now, the download is marked private: it is not shared, but still kept out of sweeps.
+        Returns True if it is shared under `key`.
+        """
+        with self.lock:
+            if key in self.entries:
+                download['private'] = True
+                self.private.append(download)
+                return False
+            entry = self.entries[key] = _Entry()
+            entry.download = download
+            entry.searched.set()
+            return True
+
+    def deliver(self, key, path, download=None):
+        """Hand the finished file at `path` to every job subscribed to `key` (a private `download` has none)"""
+        if download is not None and download.get('private'):
+            return
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and download is not None and entry.download is not download:
+                entry = None
+            subscribers = entry.subscribers if entry else []
+            if entry:
+                entry.subscribers = []
+
+        for subscription in subscribers:
+            handoff_path = os.path.join(self.handoff_dir, uuid.uuid4().hex, os.path.basename(path))
+            try:
+                os.makedirs(os.path.dirname(handoff_path))
+                shutil.copy2(path, handoff_path)
+                subscription.path = handoff_path
+            except Exception as e:
+                logger.error(f"Could not hand {path} over to another job: {e}")
+            subscription.event.set()
+        if subscribers:
+            logger.info(f"Shared {os.path.basename(path)} with {len(subscribers)} other job(s)")
+
+    def release(self, key, download=None):
+        """The owner is done with `key` (or with its private `download`); subscribers still waiting get nothing"""
+        with self.lock:
+            if download is not None and download.get('private'):
+                self.private = [other for other in self.private if other is not download]
+                return
+            entry = self.entries.get(key)
+            # Released twice, or the key has a new owner by now
+            if entry is None or (download is not None and entry.download is not download):
+                return
+            del self.entries[key]
+        if entry:
+            for subscription in entry.subscribers:
+                subscription.event.set()
+
+    def active_downloads(self):
+        """Downloads currently owned by some job, whose files no other job may sweep up"""
+        with self.lock:
+            return [entry.download for entry in self.entries.values() if entry.download] + list(self.private)
@@ -0,0 +1,149 @@
+import time
+import uuid
+import random
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from transfer_tracker import index_transfers
+
+logger = logging.getLogger(__name__)
+
+class SlskdError(Exception):
+    pass
+
+class SlskdClient:
+    """slskd REST API over one pooled session, with timeouts, retries and per-endpoint latency counters.
+
+    Idempotent calls are retried with jittered exponential back-off on connection errors, timeouts and
+    5xx responses. Queueing a download is not retried, so a slow slskd never gets the same file twice.
+    """
+
+    def __init__(self, url, api_key, timeout=15.0, connect_timeout=5.0, retries=3, backoff=0.5, pool_size=16):
+        self.base_url = f"{(url or '').rstrip('/')}/api/v0"
+        self.timeout = (connect_timeout, timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+
+        self.session = requests.Session()
+        self.session.headers['X-API-Key'] = api_key or ''
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.lock = threading.Lock()
+        # "METHOD endpoint" -> [calls, errors, total seconds, max seconds]
+        self.latency = {}
+
+    def _record(self, endpoint, elapsed, error):
+        with self.lock:
+            stats = self.latency.setdefault(endpoint, [0, 0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += 1 if error else 0
+            stats[2] += elapsed
+            stats[3] = max(stats[3], elapsed)
+
+    def _request(self, method, endpoint, path, retry=True, **kwargs):
+        """Send one API call; `endpoint` is the path template the latency is counted under"""
+        label = f"{method} {endpoint}"
+        attempts = self.retries + 1 if retry else 1
+        response = None
+        for attempt in range(attempts):
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(label, time.monotonic() - started, True)
+                response = None
+                error = e
+            else:
+                failed = response.status_code >= 500
+                self._record(label, time.monotonic() - started, failed)
+                if not failed:
+                    return response
+                error = SlskdError(f"{label} returned {response.status_code}")
+
+            if attempt + 1 < attempts:
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                logger.debug(f"{label} failed ({error}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+        # Out of attempts: a 5xx response is handed back for the caller to check, a network error is raised
+        if response is not None:
+            return response
+        raise error
+
+    def _json(self, method, endpoint, path, **kwargs):
+        response = self._request(method, endpoint, path, **kwargs)
+        if response.status_code >= 400:
+            raise SlskdError(f"{method} {endpoint} returned {response.status_code}")
+        return response.json()
+
+    # --- Searches ---
+
+    def start_search(self, search_text, timeout_ms):
+        """Start a search and return its id; the id is chosen here so a retried POST can't start two"""
+        search_id = str(uuid.uuid4())
+        payload = {'id': search_id, 'searchText': search_text, 'searchTimeout': timeout_ms}
+        response = self._request('POST', '/searches', '/searches', json=payload)
+        # 409: an earlier attempt already created it
+        if response.status_code >= 400 and response.status_code != 409:
+            raise SlskdError(f"POST /searches returned {response.status_code}")
+        return search_id
+
+    def get_search(self, search_id):
+        return self._json('GET', '/searches/{id}', f"/searches/{search_id}")
+
+    def get_search_responses(self, search_id):
+        return self._json('GET', '/searches/{id}/responses', f"/searches/{search_id}/responses")
+
+    def delete_search(self, search_id):
+        self._request('DELETE', '/searches/{id}', f"/searches/{search_id}")
+
+    # --- Transfers ---
+
+    def queue_download(self, username, files):
+        """Queue [{'filename', 'size'}] from one user; returns the HTTP status code"""
+        response = self._request('POST', '/transfers/downloads/{username}', f"/transfers/downloads/{username}",
+                                 retry=False, json=files)
+        return response.status_code
+
+    def get_downloads(self):
+        return self._json('GET', '/transfers/downloads', '/transfers/downloads')
+
+    def cancel_download(self, username, transfer_id, remove=True):
+        response = self._request('DELETE', '/transfers/downloads/{username}/{id}',
+                                 f"/transfers/downloads/{username}/{transfer_id}",
+                                 params={'remove': 'true' if remove else 'false'})
+        return response.status_code in [200, 204]
+
+    def clear_downloads(self, max_workers=8):
+        """Cancel and remove every download in the queue with concurrent deletes; returns how many were removed"""
+        transfers = [(username, transfer['id'])
+                     for (username, _), transfer in index_transfers(self.get_downloads()).items()
+                     if username and transfer.get('id')]
+        if not transfers:
+            return 0
+
+        def cancel(item):
+            try:
+                return self.cancel_download(*item)
+            except Exception:
+                return False
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, self.pool_size), thread_name_prefix="slskd") as executor:
+            return sum(1 for removed in executor.map(cancel, transfers) if removed)
+
+    # --- Stats ---
+
+    def latency_stats(self):
+        with self.lock:
+            items = sorted(self.latency.items())
+        return ", ".join(f"{label}: {calls} calls, avg {total / calls * 1000:.0f}ms, max {longest * 1000:.0f}ms"
+                         + (f", {errors} errors" if errors else "")
+                         for label, (calls, errors, total, longest) in items)
+
+    def reset_stats(self):
+        with self.lock:
+            self.latency.clear()
@@ -0,0 +1,105 @@
+import os
+import re
+import json
+import logging
+import threading
+from collections import Counter
+import spotipy
+from spotipy.oauth2 import SpotifyClientCredentials
+from library_store import write_json
+
+logger = logging.getLogger(__name__)
+
+SPOTIFY_CACHE_PATH = os.getenv("SPOTIFY_CACHE_PATH", "/music/spotify_playlists.json")
+# Only what the bridge uses: first artist name and title of each track, plus the paging link
+ITEM_FIELDS = "items(track(name,artists(name))),next"
+PLAYLIST_ID_RE = re.compile(r'playlist[/:]([A-Za-z0-9]+)')
+
+def playlist_key(playlist_id_or_url):
+    """Bare playlist id from an id, spotify:playlist: URI or open.spotify.com URL"""
+    match = PLAYLIST_ID_RE.search(playlist_id_or_url)
+    return match.group(1) if match else playlist_id_or_url.strip()
+
+def diff_tracks(old_tracks, new_tracks):
+    """(added, removed) tracks between two playlist versions, duplicates counted"""
+    old = Counter((track['artist'], track['title']) for track in old_tracks)
+    new = Counter((track['artist'], track['title']) for track in new_tracks)
+    added = [{'artist': artist, 'title': title} for (artist, title), n in (new - old).items() for _ in range(n)]
+    removed = [{'artist': artist, 'title': title} for (artist, title), n in (old - new).items() for _ in range(n)]
+    return added, removed
+
+class SpotifyPlaylists:
+    """Playlist reader with one reused Spotify client and an on-disk cache keyed by snapshot_id.
+
+    An unchanged playlist costs a single snapshot_id request; a changed one is re-read with
+    field-filtered item pages and diffed against the cached version.
+    """
+
+    def __init__(self, client_id, client_secret, cache_path=SPOTIFY_CACHE_PATH):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self._client = None
+        self.cache = {}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    self.cache = json.load(f)
+            except Exception as e:
+                logger.warning(f"Could not read Spotify cache {cache_path}: {e}")
+
+    def client(self):
+        with self.lock:
+            if self._client is None:
+                auth_manager = SpotifyClientCredentials(client_id=self.client_id, client_secret=self.client_secret)
+                self._client = spotipy.Spotify(auth_manager=auth_manager)
+            return self._client
+
+    def fetch_tracks(self, playlist_id):
+        sp = self.client()
+        results = sp.playlist_items(playlist_id, fields=ITEM_FIELDS, additional_types=('track',))
+        items = results['items']
+        while results['next']:
+            results = sp.next(results)
+            items.extend(results['items'])
+
+        tracks = []
+        for item in items:
+            track = item.get('track')
+            if not track or not track.get('artists'): continue
+            tracks.append({'artist': track['artists'][0]['name'], 'title': track['name']})
+        return tracks
+
+    def sync(self, playlist_id_or_url):
+        """Current tracks of a playlist and what changed since the last sync: (tracks, added, removed)"""
+        key = playlist_key(playlist_id_or_url)
+        playlist = self.client().playlist(key, fields="snapshot_id,name")
+        snapshot_id = playlist['snapshot_id']
+
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached:
+                cached['name'] = playlist.get('name')
+        if cached and cached['snapshot_id'] == snapshot_id:
+            logger.info(f"Spotify playlist {key} unchanged ({len(cached['tracks'])} tracks)")
+            return list(cached['tracks']), [], []
+
+        tracks = self.fetch_tracks(key)
+        added, removed = diff_tracks(cached['tracks'] if cached else [], tracks)
+        logger.info(f"Spotify playlist {key}: {len(tracks)} tracks, {len(added)} added, {len(removed)} removed")
+
+        with self.lock:
+            self.cache[key] = {'snapshot_id': snapshot_id, 'name': playlist.get('name'), 'tracks': tracks}
+            try:
+                write_json(self.cache_path, self.cache)
+            except Exception as e:
+                logger.error(f"Could not write Spotify cache {self.cache_path}: {e}")
+        return tracks, added, removed
+
+    def name(self, playlist_id_or_url):
+        """Playlist name as of the last sync, or its id if unknown"""
+        key = playlist_key(playlist_id_or_url)
+        with self.lock:
+            cached = self.cache.get(key)
+        return (cached or {}).get('name') or key
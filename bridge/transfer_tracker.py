@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+def is_terminal(state):
+    """slskd transfer states are flags like "Completed, Succeeded" or "Queued, Remotely" """
+    return (state or "").startswith("Completed")
+
+def is_succeeded(state):
+    return is_terminal(state) and "Succeeded" in state
+
+def index_transfers(downloads):
+    """Flatten GET /api/v0/transfers/downloads (user -> directories -> files) to {(username, filename): transfer}"""
+    transfers = {}
+    for user in downloads or []:
+        username = user.get('username')
+        for directory in user.get('directories', []):
+            for transfer in directory.get('files', []):
+                transfers[(username, transfer.get('filename'))] = transfer
+    return transfers
+
+def local_download_path(downloads_dir, remote_filename):
+    """Where slskd saves a remote file: <downloads>/<remote parent folder>/<file name>"""
+    parts = [part for part in remote_filename.replace('\\', '/').split('/') if part]
+    if len(parts) > 1:
+        return os.path.join(downloads_dir, parts[-2], parts[-1])
+    return os.path.join(downloads_dir, parts[-1])
+
+def find_downloaded_file(downloads_dir, remote_filename):
+    """Local path of a finished download, or None if it can't be found"""
+    expected = local_download_path(downloads_dir, remote_filename)
+    if os.path.exists(expected):
+        return expected
+    # slskd de-duplicates names ("file_1234.mp3") and folder layouts vary; fall back to a name scan
+    basename = os.path.basename(expected)
+    stem, ext = os.path.splitext(basename)
+    for root, dirs, files in os.walk(downloads_dir):
+        for filename in files:
+            if filename == basename or (filename.startswith(stem + "_") and filename.endswith(ext)):
+                return os.path.join(root, filename)
+    return None
+
+def transfer_progress(transfer):
+    return (transfer or {}).get('bytesTransferred') or 0
+
+def track_transfers(queued, fetch_downloads, on_succeeded, timeout, interval=5.0,
+                    failover=None, stall_window=180.0, min_rate=4096):
+    """Poll slskd until every queued download is terminal or `timeout` seconds pass.
+
+    `queued` are the downloads returned by search_and_download_slskd; on_succeeded(download) runs as
+    soon as a download's transfer succeeds. A transfer that fails, or moves fewer than `min_rate` bytes/s
+    over `stall_window` seconds (queued remotely, stuck, vanished), is handed to failover(download, transfer),
+    which returns True once it has re-queued the download from another candidate. A stalled transfer
+    failover can't replace keeps running until `timeout`.
+    Returns {'succeeded', 'failed', 'pending', 'recovered'} lists of downloads.
+    """
+    started = time.monotonic()
+    pending = list(queued)
+    succeeded, failed, recovered = [], [], []
+    # id(download) -> (time, bytes) at the start of the current stall window
+    checkpoints = {id(download): (started, 0) for download in pending}
+    failed_over = set()
+
+    while pending:
+        try:
+            transfers = index_transfers(fetch_downloads())
+        except Exception as e:
+            logger.warning(f"Could not fetch transfers: {e}")
+            transfers = None
+
+        if transfers is not None:
+            now = time.monotonic()
+            still_pending = []
+            for download in pending:
+                candidate = download['candidate']
+                transfer = transfers.get((candidate.username, candidate.filename))
+                state = transfer.get('state') if transfer else None
+                if is_succeeded(state):
+                    succeeded.append(download)
+                    if id(download) in failed_over:
+                        recovered.append(download)
+                    try:
+                        on_succeeded(download)
+                    except Exception as e:
+                        logger.error(f"Error handling finished download {candidate.filename}: {e}")
+                    continue
+
+                problem = None
+                if is_terminal(state):
+                    problem = state
+                else:
+                    checkpoint_at, checkpoint_bytes = checkpoints[id(download)]
+                    if now - checkpoint_at >= stall_window:
+                        rate = (transfer_progress(transfer) - checkpoint_bytes) / (now - checkpoint_at)
+                        if rate < min_rate:
+                            problem = f"stalled at {rate:.0f} B/s ({state or 'not listed'})"
+                        else:
+                            checkpoints[id(download)] = (now, transfer_progress(transfer))
+
+                if problem is None:
+                    still_pending.append(download)
+                    continue
+
+                logger.warning(f"Download {problem}: {download['artist']} - {download['title']} from {candidate.username}")
+                if failover is not None and failover(download, transfer):
+                    failed_over.add(id(download))
+                    checkpoints[id(download)] = (now, 0)
+                    still_pending.append(download)
+                elif not is_terminal(state):
+                    # Nothing to replace it with: a slow peer may still deliver before the deadline
+                    checkpoints[id(download)] = (now, transfer_progress(transfer))
+                    still_pending.append(download)
+                else:
+                    failed.append(download)
+            pending = still_pending
+
+        if not pending or time.monotonic() - started >= timeout:
+            break
+        time.sleep(interval)
+
+    logger.info(f"Transfers after {time.monotonic() - started:.0f}s: {len(succeeded)} succeeded "
+                f"({len(recovered)} recovered from another peer), {len(failed)} failed, "
+                f"{len(pending)} still in progress")
+    return {'succeeded': succeeded, 'failed': failed, 'pending': pending, 'recovered': recovered}
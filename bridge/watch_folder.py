@@ -0,0 +1,233 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyUnavailable(Exception):
+    pass
+
+class Inotify:
+    """Minimal inotify binding over libc (no extra dependency); Linux only"""
+
+    def __init__(self, path, mask):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+            init1, add_watch = libc.inotify_init1, libc.inotify_add_watch
+        except (OSError, AttributeError) as e:
+            raise InotifyUnavailable(e)
+
+        self.fd = init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise InotifyUnavailable(os.strerror(ctypes.get_errno()))
+        if add_watch(self.fd, os.fsencode(path), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise InotifyUnavailable(os.strerror(error))
+
+    def wait(self, timeout, wake_fd=None):
+        """Block until events arrive, `wake_fd` is readable or `timeout` seconds pass; returns [(mask, name)]"""
+        readable, _, _ = select.select([self.fd] + ([wake_fd] if wake_fd is not None else []), [], [], max(0.0, timeout))
+        if self.fd not in readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+            events.append((mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+class WatchFolder:
+    """Reports new playlist files in a folder once they have been completely written.
+
+    Uses inotify when available: a file is ready `debounce` seconds after its writer closed it (or it
+    was moved in) with no further events, and idle waiting is a blocking select. Otherwise (or with
+    mode="poll") the folder is listed every `poll_interval` seconds and a file is ready once its size
+    and mtime stayed the same for `debounce` seconds. retry() reports a file again later even if it
+    didn't change, and may be called from any thread.
+    """
+
+    def __init__(self, path, extensions, debounce=1.0, poll_interval=10.0, mode="auto"):
+        self.path = path
+        self.extensions = tuple(extensions)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        # name -> time of the last event (inotify) or (fingerprint, first seen) (polling)
+        self.pending = {}
+        self.closed = set()
+        self.seen = set()
+        self.next_poll = 0.0
+        # name -> monotonic time it is due to be reported again
+        self.retries = {}
+        self.lock = threading.Lock()
+        # Written to by retry() to wake up a wait() already in progress
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        os.set_blocking(self.wake_w, False)
+        self.inotify = None
+        if mode != "poll":
+            try:
+                self.inotify = Inotify(path, IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY |
+                                       IN_DELETE_SELF | IN_MOVE_SELF)
+                logger.info(f"Watching {path} with inotify")
+            except InotifyUnavailable as e:
+                logger.info(f"inotify unavailable for {path} ({e}), polling every {poll_interval:.0f}s")
+
+    def wanted(self, name):
+        return name.endswith(self.extensions)
+
+    def retry(self, path, delay):
+        """Report `path` as ready again in `delay` seconds, e.g. after processing it failed"""
+        with self.lock:
+            self.retries[os.path.basename(path)] = time.monotonic() + delay
+        try:
+            os.write(self.wake_w, b'\0')
+        except BlockingIOError:
+            pass
+
+    def _due_retries(self, now):
+        """Paths of retries that are due (and still exist), and seconds until the next one (None if none)"""
+        try:
+            while os.read(self.wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self.lock:
+            due = sorted(name for name, at in self.retries.items() if at <= now)
+            for name in due:
+                del self.retries[name]
+            next_retry = min(self.retries.values(), default=None)
+        paths = [os.path.join(self.path, name) for name in due if os.path.exists(os.path.join(self.path, name))]
+        return paths, None if next_retry is None else next_retry - now
+
+    def wait(self, timeout):
+        """Wait up to `timeout` seconds; returns full paths of files that became ready"""
+        if self.inotify is not None:
+            return self._wait_inotify(timeout)
+        return self._wait_poll(timeout)
+
+    def _ready(self, now):
+        ready = [name for name, last_event in self.pending.items()
+                 if name in self.closed and now - last_event >= self.debounce]
+        for name in ready:
+            del self.pending[name]
+            self.closed.discard(name)
+        return [os.path.join(self.path, name) for name in sorted(ready)]
+
+    def _wait_inotify(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            retried, next_retry = self._due_retries(now)
+            ready = self._ready(now) + retried
+            if ready:
+                return ready
+
+            wait_for = deadline - now
+            if wait_for <= 0:
+                return []
+            if next_retry is not None:
+                wait_for = min(wait_for, next_retry)
+            # Wake up when the next closed file's debounce ends
+            closed_pending = [self.pending[name] + self.debounce - now for name in self.closed if name in self.pending]
+            if closed_pending:
+                wait_for = min(wait_for, max(0.0, min(closed_pending)))
+
+            for mask, name in self.inotify.wait(wait_for, self.wake_r):
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    logger.warning(f"Watch folder {self.path} went away, falling back to polling")
+                    self.inotify.close()
+                    self.inotify = None
+                    return self._wait_poll(max(0.0, deadline - time.monotonic()))
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped: treat everything currently in the folder as just written
+                    for existing in os.listdir(self.path):
+                        if self.wanted(existing):
+                            self.pending[existing] = time.monotonic()
+                            self.closed.add(existing)
+                    continue
+                if mask & IN_ISDIR or not self.wanted(name):
+                    continue
+                self.pending[name] = time.monotonic()
+                if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    self.closed.add(name)
+                else:
+                    # Written to again: wait for the next close
+                    self.closed.discard(name)
+
+    def _wait_poll(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            ready, next_retry = self._due_retries(now)
+            if now >= self.next_poll:
+                self.next_poll = now + self.poll_interval
+                ready += [path for path in self._poll(now) if path not in ready]
+            if ready:
+                return ready
+            if now >= deadline:
+                return []
+            wake_at = min(self.next_poll, deadline)
+            if next_retry is not None:
+                wake_at = min(wake_at, now + next_retry)
+            select.select([self.wake_r], [], [], max(0.0, wake_at - now))
+
+    def _poll(self, now):
+        if not os.path.isdir(self.path):
+            return []
+        ready = []
+        present = set()
+        for name in os.listdir(self.path):
+            if not self.wanted(name):
+                continue
+            present.add(name)
+            if name in self.seen:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            fingerprint = (stat.st_size, stat.st_mtime_ns)
+            previous = self.pending.get(name)
+            if previous is None or previous[0] != fingerprint:
+                self.pending[name] = (fingerprint, now)
+            elif now - previous[1] >= self.debounce:
+                del self.pending[name]
+                self.seen.add(name)
+                ready.append(os.path.join(self.path, name))
+        # Forget files that were renamed or removed so a new file with the same name is picked up
+        self.seen &= present
+        for name in set(self.pending) - present:
+            del self.pending[name]
+        return sorted(ready)
@@ -1,115 +1,226 @@
 import json
 import os
-import re
-
-LIBRARY_INDEX_PATH = "/Volumes/DeliRAID5/Media/Music/library_index.json"
-DAILY_DIR = "/Volumes/DeliRAID5/Media/Music/Daily"
-
-def normalize_string(s):
-    """Normalize string: lowercase, remove special chars, single spaces."""
-    # Remove special characters, keep only alphanumeric and spaces
-    s = re.sub(r'[^\w\s]', ' ', s.lower())
-    # Replace multiple spaces with single space
-    s = re.sub(r'\s+', ' ', s).strip()
-    return s
-
-def matches_track(filename, artist, title):
-    """Check if filename contains artist and title (fuzzy match)."""
-    filename_norm = normalize_string(filename)
-    artist_norm = normalize_string(artist)
-    title_norm = normalize_string(title)
-    return artist_norm in filename_norm and title_norm in filename_norm
+import sys
+import argparse
+
+# Shared index helpers live with the bridge service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "bridge"))
+from library_store import JsonLibraryStore, SqliteLibraryStore, read_library_index  # noqa: E402
+from normalize import normalize_string  # noqa: E402
+from audio_hash import hash_audio, load_hash_index  # noqa: E402
+
+# Paths come from the environment (or CLI flags), defaults match the bridge container layout
+MUSIC_DIR = os.getenv("MUSIC_DIR", "/music")
+LIBRARY_INDEX_PATH = os.getenv("LIBRARY_INDEX_PATH", os.path.join(MUSIC_DIR, "library_index.json"))
+LIBRARY_DB_PATH = os.getenv("LIBRARY_DB_PATH", os.path.join(MUSIC_DIR, "library_index.db"))
+LIBRARY_BACKEND = os.getenv("LIBRARY_BACKEND", "json")
+DAILY_DIR = os.getenv("DAILY_DIR", os.path.join(MUSIC_DIR, "Daily"))
+LIBRARY_HASH_INDEX_PATH = os.getenv("LIBRARY_HASH_INDEX_PATH", os.path.join(MUSIC_DIR, "library_hashes.json"))
+
+def split_artist_title(name_no_ext):
+    """Parse Artist - Title from a Daily filename (Daily files are formatted as "Artist - Title.mp3")."""
+    if " - " in name_no_ext:
+        parts = name_no_ext.split(" - ", 1)
+        return parts[0].strip(), parts[1].strip()
+    # Fallback if format is unexpected
+    return "", name_no_ext
+
+class DuplicateLookup:
+    """Precomputed lookups over the library index for the three duplicate checks.
+
+    Every method returns candidate positions in index order, so the reported match is the same
+    library entry the old linear scan (methods 1-3 per entry, first entry wins) would have found.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.entries = store.entries()
+        self.keys = [key for key, _ in store.items()]
+
+        # Method 1: normalized "Artist - Title" -> first position
+        self.by_stem = {}
+        # Method 3: library key artist -> positions (key is already lowercase from index generation)
+        self.by_key_artist = {}
+        for position, (key, entry) in enumerate(zip(self.keys, self.entries)):
+            self.by_stem.setdefault(entry['stem_norm'], position)
+            if " - " in key:
+                key_artist, key_title = key.split(" - ", 1)
+                self.by_key_artist.setdefault(key_artist, []).append((position, key_title))
+        self.key_artist_lengths = sorted({len(key_artist) for key_artist in self.by_key_artist})
+
+    def _method1(self, daily_norm):
+        # Method 1: Direct normalized filename comparison
+        return self.by_stem.get(daily_norm)
+
+    def _method2(self, artist_daily, title_daily):
+        # Method 2: Fuzzy match - Check if Daily Artist/Title exists inside Library Canonical Name
+        # (Useful if Daily has slight variations but Library is definitive)
+        if not (artist_daily and title_daily):
+            return None
+        artist_norm = normalize_string(artist_daily)
+        title_norm = normalize_string(title_daily)
+        for position in sorted(self.store.candidates('norm', artist_norm, title_norm)):
+            name_norm = self.entries[position]['name_norm']
+            if artist_norm in name_norm and title_norm in name_norm:
+                return position
+        return None
+
+    def _method3(self, daily_norm):
+        # Method 3: Reverse Fuzzy - Check if Library Artist/Title (from Key) exists in Daily Filename
+        # This handles cases where Daily filename might be "Artist - Title (Radio Edit)" and Library is "Artist - Title"
+        # Candidates: every substring of the Daily name that is some library key artist
+        best = None
+        for length in self.key_artist_lengths:
+            if length > len(daily_norm):
+                break
+            seen = set()
+            for start in range(len(daily_norm) - length + 1):
+                fragment = daily_norm[start:start + length]
+                if fragment in seen:
+                    continue
+                seen.add(fragment)
+                for position, key_title in self.by_key_artist.get(fragment, ()):
+                    if best is not None and position >= best:
+                        break
+                    if key_title in daily_norm:
+                        best = position
+                        break
+        return best
+
+    def find(self, filename):
+        """Return (library entry, library key, method) for a Daily file, or None."""
+        name_no_ext = os.path.splitext(filename)[0]
+        artist_daily, title_daily = split_artist_title(name_no_ext)
+        daily_norm = normalize_string(name_no_ext)
+
+        matches = [
+            (position, method)
+            for method, position in (
+                (1, self._method1(daily_norm)),
+                (2, self._method2(artist_daily, title_daily)),
+                (3, self._method3(daily_norm)),
+            )
+            if position is not None
+        ]
+        if not matches:
+            return None
+        position, method = min(matches)
+        return self.entries[position], self.keys[position], method
+
+def load_store(args):
+    if args.backend == "sqlite":
+        if not os.path.exists(args.db):
+            print(f"Error: Library database not found at {args.db}")
+            return None
+        db = SqliteLibraryStore(args.db)
+        store = JsonLibraryStore(dict(db.items()))
+        db.close()
+        return store
+
+    if not os.path.exists(args.index):
+        print(f"Error: Library index not found at {args.index}")
+        return None
+    return JsonLibraryStore(read_library_index(args.index))
 
 def main():
-    if not os.path.exists(LIBRARY_INDEX_PATH):
-        print(f"Error: Library index not found at {LIBRARY_INDEX_PATH}")
-        return
+    parser = argparse.ArgumentParser(description="Remove files from the Daily folder that already exist in the library")
+    parser.add_argument("--index", default=LIBRARY_INDEX_PATH, help="library_index.json path (env LIBRARY_INDEX_PATH)")
+    parser.add_argument("--db", default=LIBRARY_DB_PATH, help="library_index.db path (env LIBRARY_DB_PATH)")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default=LIBRARY_BACKEND)
+    parser.add_argument("--daily", default=DAILY_DIR, help="Daily folder (env DAILY_DIR)")
+    parser.add_argument("--hashes", default=LIBRARY_HASH_INDEX_PATH, help="library_hashes.json path (env LIBRARY_HASH_INDEX_PATH)")
+    parser.add_argument("--mode", choices=["name", "hash", "both"], default="name",
+                        help="Match by name (methods 1-3), by audio content hash, or both")
+    parser.add_argument("--dry-run", action="store_true", help="Only report duplicates, don't delete anything")
+    parser.add_argument("--report", help="Write a JSON report of all matches to this file ('-' for stdout)")
+    args = parser.parse_args()
 
     print("Loading library index...")
-    with open(LIBRARY_INDEX_PATH, 'r', encoding='utf-8') as f:
-        library_index = json.load(f)
+    store = load_store(args)
+    if store is None:
+        return
 
-    if not os.path.exists(DAILY_DIR):
-        print(f"Error: Daily directory not found at {DAILY_DIR}")
+    if not os.path.exists(args.daily):
+        print(f"Error: Daily directory not found at {args.daily}")
         return
 
-    files = [f for f in os.listdir(DAILY_DIR) if f.lower().endswith('.mp3')]
-    print(f"Checking {len(files)} files in Daily folder against {len(library_index)} library entries...")
+    files = sorted(f for f in os.listdir(args.daily) if f.lower().endswith('.mp3'))
+    print(f"Checking {len(files)} files in Daily folder against {len(store)} library entries...")
+
+    hash_index = hash_store = None
+    if args.mode != "name":
+        # The SQLite backend keeps the hashes in its files table instead of library_hashes.json
+        hashes_source = args.db if args.backend == "sqlite" else args.hashes
+        hash_store = SqliteLibraryStore(args.db) if args.backend == "sqlite" else None
+        hash_index = hash_store.hash_index() if hash_store else load_hash_index(args.hashes)
+        if not hash_index:
+            print(f"Warning: no audio hashes at {hashes_source} (run scan_library.py), only Daily files are compared")
 
+    lookup = DuplicateLookup(store)
     deleted_count = 0
+    report = []
+    # audio hash -> first kept Daily file with that payload
+    daily_hashes = {}
 
     for filename in files:
-        filepath = os.path.join(DAILY_DIR, filename)
-
-        # Parse Artist - Title from filename (Daily files are formatted as "Artist - Title.mp3")
-        name_no_ext = os.path.splitext(filename)[0]
-
-        artist_daily = ""
-        title_daily = ""
-
-        if " - " in name_no_ext:
-            parts = name_no_ext.split(" - ", 1)
-            artist_daily = parts[0].strip()
-            title_daily = parts[1].strip()
+        filepath = os.path.join(args.daily, filename)
+        match = lookup.find(filename) if args.mode != "hash" else None
+        if match:
+            entry, key, method = match
+            library_path = entry['path']
+        elif hash_index is not None:
+            try:
+                audio_hash = hash_audio(filepath)
+            except OSError as e:
+                print(f"Error hashing '{filename}': {e}")
+                continue
+            if audio_hash is None:
+                continue
+            if audio_hash in hash_index:
+                library_path, key, method = hash_index[audio_hash], None, "hash"
+            elif audio_hash in daily_hashes:
+                library_path, key, method = daily_hashes[audio_hash], None, "hash, same as Daily file"
+            else:
+                daily_hashes[audio_hash] = filepath
+                continue
         else:
-            # Fallback if format is unexpected
-            artist_daily = ""
-            title_daily = name_no_ext
-
-        daily_norm = normalize_string(name_no_ext)
+            continue
 
-        found = False
-        match_path = ""
+        print(f"Duplicate found: '{filename}'")
+        print(f"  -> Matches Library: '{library_path}' (method {method})")
+        item = {"file": filepath, "library_path": library_path, "library_key": key, "method": method, "deleted": False}
 
-        # Check against library entries
-        for key, entry in library_index.items():
-            # entry['canonical_name'] is typically "Artist - Title.mp3"
-            lib_canon_name = entry.get('canonical_name', '')
-            lib_canon_no_ext = os.path.splitext(lib_canon_name)[0]
-
-            # Method 1: Direct normalized filename comparison
-            lib_norm = normalize_string(lib_canon_no_ext)
-
-            if daily_norm == lib_norm:
-                found = True
-                match_path = entry['path']
-                break
-
-            # Method 2: Fuzzy match - Check if Daily Artist/Title exists inside Library Canonical Name
-            # (Useful if Daily has slight variations but Library is definitive)
-            if artist_daily and title_daily:
-                if matches_track(lib_canon_name, artist_daily, title_daily):
-                    found = True
-                    match_path = entry['path']
-                    break
-
-            # Method 3: Reverse Fuzzy - Check if Library Artist/Title (from Key) exists in Daily Filename
-            # Key is usually "artist - title" (lowercase)
-            # This handles cases where Daily filename might be "Artist - Title (Radio Edit)" and Library is "Artist - Title"
-            if " - " in key:
-                 # key is already normalized/lowercase in index generation
-                 key_parts = key.split(" - ", 1)
-                 if len(key_parts) == 2:
-                     key_artist = key_parts[0]
-                     key_title = key_parts[1]
-                     # Check if the library key components are in the daily filename
-                     if key_artist in daily_norm and key_title in daily_norm:
-                         found = True
-                         match_path = entry['path']
-                         break
-
-        if found:
-            print(f"Duplicate found: '{filename}'")
-            print(f"  -> Matches Library: '{match_path}'")
+        if args.dry_run:
+            print("  -> Dry run, kept.")
+        else:
             try:
                 os.remove(filepath)
-                print(f"  -> DELETED.")
+                print("  -> DELETED.")
+                item["deleted"] = True
                 deleted_count += 1
             except Exception as e:
                 print(f"  -> Error deleting: {e}")
+                item["error"] = str(e)
+        report.append(item)
+
+    if hash_store:
+        hash_store.close()
 
     print("-" * 30)
-    print(f"Cleanup finished. Deleted {deleted_count} duplicate files.")
+    if args.dry_run:
+        print(f"Dry run finished. Found {len(report)} duplicate files.")
+    else:
+        print(f"Cleanup finished. Deleted {deleted_count} duplicate files.")
+
+    if args.report:
+        data = {"daily_dir": args.daily, "mode": args.mode, "checked": len(files), "duplicates": len(report),
+                "deleted": deleted_count, "dry_run": args.dry_run, "matches": report}
+        if args.report == "-":
+            print(json.dumps(data, ensure_ascii=False, indent=2))
+        else:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            print(f"Report written to {args.report}")
 
 if __name__ == "__main__":
     main()
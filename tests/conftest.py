@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The bridge modules import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bridge"))
+
+# Keep the state files main.py opens at import time out of /music
+STATE_DIR = tempfile.mkdtemp(prefix="bridge-tests-")
+for name, filename in (("JOB_JOURNAL_PATH", "bridge_journal.db"), ("JOB_STATUS_PATH", "bridge_jobs.json"),
+                       ("SEARCH_CACHE_PATH", "search_cache.json"), ("SPOTIFY_CACHE_PATH", "spotify_playlists.json")):
+    os.environ.setdefault(name, os.path.join(STATE_DIR, filename))
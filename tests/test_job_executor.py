@@ -0,0 +1,61 @@
+import json
+import time
+import threading
+
+from job_executor import JobExecutor
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_a_busy_sync_lane_does_not_hold_up_watch_jobs(tmp_path):
+    jobs = JobExecutor({'sync': 1, 'watch': 1}, status_path=str(tmp_path / "jobs.json"))
+    jobs.start()
+    sync_started, release_sync = threading.Event(), threading.Event()
+    watch_done = threading.Event()
+
+    def long_sync():
+        sync_started.set()
+        release_sync.wait(5)
+
+    sync_job = jobs.submit('sync', "daily sync", long_sync)
+    assert sync_started.wait(5)
+    watch_job = jobs.submit('watch', "watch a.txt", watch_done.set)
+
+    assert watch_done.wait(5)
+    assert sync_job.status == "running"
+    release_sync.set()
+    assert wait_for(lambda: sync_job.status == "done" and watch_job.status == "done")
+
+def test_a_pending_job_of_the_same_name_is_not_queued_twice(tmp_path):
+    jobs = JobExecutor({'sync': 1}, status_path=str(tmp_path / "jobs.json"))
+    jobs.start()
+    release = threading.Event()
+
+    first = jobs.submit('sync', "daily sync", release.wait, 5)
+    assert jobs.submit('sync', "daily sync", release.wait, 5) is None
+    release.set()
+    assert wait_for(lambda: first.status == "done")
+    assert jobs.submit('sync', "daily sync", lambda: None) is not None
+
+def test_status_file_shows_progress_and_failures(tmp_path):
+    status_path = tmp_path / "jobs.json"
+    jobs = JobExecutor({'watch': 1}, status_path=str(status_path))
+    jobs.start()
+
+    def failing_job():
+        jobs.report("searching 3 tracks")
+        raise RuntimeError("slskd unreachable")
+
+    job = jobs.submit('watch', "watch b.m3u", failing_job)
+    assert wait_for(lambda: job.status == "failed")
+    assert wait_for(lambda: json.loads(status_path.read_text())[0]['status'] == "failed")
+
+    status = json.loads(status_path.read_text())[0]
+    assert status['progress'] == "searching 3 tracks"
+    assert status['error'] == "slskd unreachable"
+    assert jobs.running_count() == 0
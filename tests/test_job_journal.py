@@ -0,0 +1,176 @@
+import os
+import time
+import threading
+
+import pytest
+
+import job_journal
+import main
+from candidate_ranking import Candidate
+from job_journal import JobJournal, MATCHED, SEARCHED, DOWNLOADED, ORGANIZED, QUEUED as STAGE_QUEUED
+from shared_downloads import SharedDownloads
+from transfer_tracker import local_download_path
+
+def make_download(artist, title, username="peer"):
+    candidate = Candidate(90.0, username, f"@@music\\{artist}\\{artist} - {title}.mp3", 8000000, 320, 0, 1000000)
+    backup = Candidate(50.0, "other", f"@@other\\{artist} - {title}.mp3", 8000000, 320, 3, 500000)
+    return {'artist': artist, 'title': title, 'candidate': candidate, 'alternates': [backup], 'retries': 0}
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    journal = JobJournal(str(tmp_path / "journal.db"))
+    monkeypatch.setattr(main, "journal", journal)
+    yield journal
+    journal.close()
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    shared = SharedDownloads(str(tmp_path / "shared"))
+    monkeypatch.setattr(main, "shared_downloads", shared)
+    return shared
+
+@pytest.fixture
+def soulseek_dir(tmp_path, monkeypatch):
+    path = tmp_path / "_Soulseek"
+    path.mkdir()
+    monkeypatch.setattr(main, "SOULSEEK_DOWNLOADS_DIR", str(path))
+    return path
+
+def fake_transfers(soulseek_dir):
+    """track_transfers stand-in: every queued transfer finishes at once"""
+    def track_transfers(queued, fetch_downloads, on_succeeded, *args, **kwargs):
+        for download in queued:
+            path = local_download_path(str(soulseek_dir), download['candidate'].filename)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b"audio")
+            on_succeeded(download)
+        return {'succeeded': list(queued), 'failed': [], 'pending': [], 'recovered': []}
+    return track_transfers
+
+def interrupted_run(journal, name, download):
+    """A run that queued `download` and then died before finish()"""
+    track = {'artist': download['artist'], 'title': download['title']}
+    run_id = journal.start(name, {}, [(main.track_key(track), track)])
+    journal.set_stage(run_id, main.track_key(track), STAGE_QUEUED, download=download)
+    return run_id
+
+def test_journal_resumes_an_interrupted_run_with_its_downloads(journal):
+    tracks = [{'artist': "A", 'title': "One"}, {'artist': "A", 'title': "Two"}, {'artist': "A", 'title': "Three"}]
+    run_id = journal.start("daily sync", {'library_matches': ["/music/x.mp3"]},
+                           [(main.track_key(track), track) for track in tracks])
+    journal.set_stage(run_id, "a - one", SEARCHED)
+    journal.set_stage(run_id, "a - two", STAGE_QUEUED, download=make_download("A", "Two"))
+    journal.set_stage(run_id, "a - two", DOWNLOADED, path="/downloads/_Soulseek/music/A - Two.mp3")
+
+    run = journal.unfinished("daily sync")
+    assert run['id'] == run_id
+    assert run['data'] == {'library_matches': ["/music/x.mp3"]}
+    rows = {row['key']: row for row in journal.tracks(run_id)}
+    assert [rows[key]['stage'] for key in ("a - one", "a - two", "a - three")] == [SEARCHED, DOWNLOADED, MATCHED]
+    # The download survives the later stage update, with its candidates intact
+    assert rows["a - two"]['download'] == make_download("A", "Two")
+    assert rows["a - two"]['path'] == "/downloads/_Soulseek/music/A - Two.mp3"
+
+    journal.finish(run_id)
+    assert journal.unfinished("daily sync") is None
+    assert journal.last_completed("daily sync") is not None
+
+def test_stale_runs_are_not_resumed_and_new_runs_abandon_them(journal, monkeypatch):
+    old_run = journal.start("watch a.m3u", {}, [])
+    monkeypatch.setattr(job_journal, "JOURNAL_RESUME_HOURS", 0)
+    time.sleep(0.01)
+    assert journal.unfinished("watch a.m3u") is None
+
+    monkeypatch.setattr(job_journal, "JOURNAL_RESUME_HOURS", 24)
+    new_run = journal.start("watch a.m3u", {}, [])
+    assert journal.unfinished("watch a.m3u")['id'] == new_run != old_run
+
+def test_restore_while_another_job_searches_a_track_it_then_misses(journal, shared, soulseek_dir, monkeypatch):
+    ours = make_download("A", "One")
+    run_id = interrupted_run(journal, "daily sync", ours)
+
+    # The watch lane started searching the same track before the resumed sync got to it
+    searching, finish = threading.Event(), threading.Event()
+    other_result = {}
+    def other_search():
+        searching.set()
+        finish.wait(5)
+        return None
+    other = threading.Thread(target=lambda: other_result.setdefault('download', shared.acquire("a - one", other_search)))
+    other.start()
+    assert searching.wait(5)
+
+    restored = main.restore_downloads(run_id, journal.tracks(run_id))
+    finish.set()
+    other.join(5)
+    assert other_result['download'] is None
+
+    # Our transfer is still ours and protected from other jobs' sweeps
+    assert len(restored) == 1
+    assert restored[0]['candidate'] == ours['candidate'] and 'subscription' not in restored[0]
+    assert restored[0] in shared.active_downloads()
+
+    monkeypatch.setattr(main, "track_transfers", fake_transfers(soulseek_dir))
+    organized = []
+    main.wait_for_downloads(restored, lambda download, path: organized.append(path))
+
+    assert organized == [local_download_path(str(soulseek_dir), ours['candidate'].filename)]
+    assert shared.active_downloads() == [] and shared.entries == {}
+    assert journal.tracks(run_id)[0]['stage'] == ORGANIZED
+
+def test_restore_while_another_job_downloads_the_track(journal, shared, soulseek_dir, monkeypatch):
+    ours = make_download("A", "One")
+    run_id = interrupted_run(journal, "watch a.m3u", ours)
+
+    # The sync lane owns the track now, and a third job subscribed to it
+    theirs = make_download("A", "One", username="someone-else")
+    assert shared.acquire("a - one", lambda: theirs) is theirs
+    subscriber = shared.acquire("a - one", lambda: None)
+
+    restored = main.restore_downloads(run_id, journal.tracks(run_id))
+    assert len(restored) == 1 and restored[0]['candidate'] == ours['candidate']
+    assert {id(download) for download in shared.active_downloads()} == {id(theirs), id(restored[0])}
+
+    monkeypatch.setattr(main, "track_transfers", fake_transfers(soulseek_dir))
+    organized = []
+    main.wait_for_downloads(restored, lambda download, path: organized.append(path))
+
+    assert len(organized) == 1
+    # Finishing ours neither delivers to nor releases the other job's entry
+    assert shared.entries["a - one"].download is theirs
+    assert not subscriber['subscription'].event.is_set()
+    assert shared.active_downloads() == [theirs]
+
+def daily_state(playlist_tracks):
+    return {'playlist_tracks': playlist_tracks, 'library_matches': [], 'library_paths': {},
+            'tracks_to_download': [], 'to_search': []}
+
+def test_a_daily_sync_that_raises_is_not_resumed(journal, monkeypatch):
+    monkeypatch.setattr(main, "match_daily_tracks", lambda: daily_state({'playlist': [{'artist': "A", 'title': "One"}]}))
+    def broken_sync(run_id, state, resumed):
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(main, "sync_daily_tracks", broken_sync)
+
+    with pytest.raises(RuntimeError):
+        main.job_daily_sync()
+
+    # The next sync fetches the playlists again rather than picking up the failed run's state
+    assert journal.unfinished(main.DAILY_SYNC_JOB) is None
+    assert journal.last_completed(main.DAILY_SYNC_JOB) is None
+
+def test_a_daily_sync_missing_a_playlist_is_not_a_full_sync(journal, monkeypatch):
+    synced = []
+    monkeypatch.setattr(main, "sync_daily_tracks", lambda run_id, state, resumed: synced.append(run_id))
+
+    # Spotify failed for the second playlist
+    monkeypatch.setattr(main, "match_daily_tracks",
+                        lambda: daily_state({'good': [{'artist': "A", 'title': "One"}], 'bad': []}))
+    main.job_daily_sync()
+    assert journal.last_completed(main.DAILY_SYNC_JOB) is None
+    assert journal.unfinished(main.DAILY_SYNC_JOB) is None
+
+    monkeypatch.setattr(main, "match_daily_tracks", lambda: daily_state({'good': [{'artist': "A", 'title': "One"}]}))
+    main.job_daily_sync()
+    assert journal.last_completed(main.DAILY_SYNC_JOB) is not None
+    assert len(synced) == 2
@@ -0,0 +1,86 @@
+import re
+import random
+
+import pytest
+from unidecode import unidecode
+
+import normalize
+from main import matches_track
+
+# normalize.py must give the same results as the per-script functions it replaced, which built the
+# library index keys; those are kept here verbatim as the reference
+
+def legacy_clean_string(text):
+    """scan_library.py version (the one the library index keys were built with)"""
+    if not text:
+        return ""
+    keywords = r"\bradio\b|\bedit\b|\bmix\b|\bremix\b|\bremaster\b|\bfeat\b|\bft\.?|\bfeature\b|\bextended\b|\bclub\b|\boriginal\b|\bvocal\b|\bversion\b"
+    pattern = r'\s*[(\[][^\x29\x5D]*?(?:' + keywords + r')[^\x29\x5D]*?[)\x5D]'
+    prev_text = None
+    while text != prev_text:
+        prev_text = text
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\s*-\s*.*?(?:' + keywords + r').*?$', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\s+(?:feat|ft\.|feature)\.?\s+.*$', '', text, flags=re.IGNORECASE)
+    return text.strip()
+
+def legacy_normalize_string(s):
+    s = re.sub(r'[^\w\s]', ' ', s.lower())
+    s = re.sub(r'\s+', ' ', s).strip()
+    return s
+
+def legacy_matches_track(filename, artist, title):
+    f_norm = legacy_normalize_string(filename)
+    a_norm = legacy_normalize_string(artist)
+    t_norm = legacy_normalize_string(title)
+    if a_norm in f_norm and t_norm in f_norm:
+        return True
+    f_uni = legacy_normalize_string(unidecode(filename))
+    a_uni = legacy_normalize_string(unidecode(artist))
+    t_uni = legacy_normalize_string(unidecode(title))
+    return a_uni in f_uni and t_uni in f_uni
+
+GOLDEN = [
+    "", " ", "Song", "Song (Radio Edit)", "Song [Extended Mix]", "Song (feat. Someone)", "Song (Ft. Someone)",
+    "Song ft. Someone", "Song feat Someone", "Song - Radio Edit", "Song - 2011 Remaster", "Song - Remastered 2011",
+    "Song (Live) - Club Mix", "Cover Me (Acoustic)", "Song (Original Mix) [Vocal Version]", "Song ((radio) edit)",
+    "Song (a (radio) b)", "Song [x (edit] y)", "Left (ftw)", "Группа крови", "Кино - Группа крови (Remix)",
+    "Björk - Jóga", "Sigur Rós", "AC/DC - T.N.T.", "Beyoncé feat. JAY-Z", "  multiple   spaces\there ",
+    "under_score", "Ёлка", "日本語 タイトル", "Don't Stop Me Now - 2011 Remaster", "Song (Ft Someone)",
+    "Artist\u00a0Name", "tab\tand\nnewline", "Земфира - Хочешь? (Remastered Version)", "x - y - z (Club Mix)",
+]
+
+FUZZ_ALPHABET = ["(", ")", "[", "]", " ", "-", ".", "/", "radio", "Edit", "ft.", "ft", "feat", "Mix", "Version",
+                 "a", "Б", "é", "ё", "_", "'", "Love", "ночь", "\t", "Original", "club"]
+
+def fuzz_corpus(count, seed=1):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 12))) for _ in range(count)]
+
+CORPUS = GOLDEN + fuzz_corpus(2000)
+
+@pytest.mark.parametrize("text", GOLDEN)
+def test_golden_strings_match_the_legacy_functions(text):
+    clean = legacy_clean_string(text)
+    norm = legacy_normalize_string(text)
+    uni = legacy_normalize_string(unidecode(text))
+    assert normalize.clean_string(text) == clean
+    assert normalize.normalize_string(text) == norm
+    assert normalize.normalize_transliterated(text) == uni
+    assert tuple(normalize.forms(text)) == (clean, norm, uni)
+
+def test_fuzzed_strings_match_the_legacy_functions():
+    mismatches = [text for text in CORPUS
+                  if tuple(normalize.forms(text)) != (legacy_clean_string(text), legacy_normalize_string(text),
+                                                      legacy_normalize_string(unidecode(text)))]
+    assert mismatches == []
+
+def test_matches_track_agrees_with_the_legacy_version():
+    rng = random.Random(2)
+    mismatches = []
+    for _ in range(len(CORPUS)):
+        filename, artist, title = (rng.choice(CORPUS) for _ in range(3))
+        filename = f"{artist} - {filename} {title}" if rng.random() < 0.5 else filename
+        if matches_track(filename, artist, title) != legacy_matches_track(filename, artist, title):
+            mismatches.append((filename, artist, title))
+    assert mismatches == []
@@ -0,0 +1,56 @@
+import time
+import threading
+
+import main
+from search_scheduler import RateLimiter, run_searches
+
+class CountingSlskd:
+    """Fake slskd that records how many searches are in flight at once"""
+
+    def __init__(self, duration=0.05):
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.started = {}
+        self.in_flight = 0
+        self.peak = 0
+        self.total = 0
+
+    def start_search(self, query, timeout_ms):
+        with self.lock:
+            self.total += 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            search_id = str(self.total)
+            self.started[search_id] = time.monotonic()
+        return search_id
+
+    def get_search(self, search_id):
+        done = time.monotonic() - self.started[search_id] >= self.duration
+        return {'responseCount': 0, 'isComplete': done}
+
+    def get_search_responses(self, search_id):
+        return []
+
+    def delete_search(self, search_id):
+        with self.lock:
+            self.in_flight -= 1
+
+def test_variant_searches_stay_within_the_concurrency_cap(monkeypatch):
+    slskd = CountingSlskd()
+    monkeypatch.setattr(main, "slskd", slskd)
+    monkeypatch.setattr(main, "search_slots", threading.BoundedSemaphore(4))
+    monkeypatch.setattr(main, "search_rate_limiter", RateLimiter(0))
+    monkeypatch.setattr(main, "SLSKD_VARIANT_STAGE_DELAY", 0)
+    monkeypatch.setattr(main, "SLSKD_POLL_INITIAL_INTERVAL", 0.01)
+    monkeypatch.setattr(main.search_cache, "force", True)
+    monkeypatch.setattr(main.search_cache, "record", lambda *args, **kwargs: None)
+
+    # Every track plans several query variants, all started at once without a stage delay
+    tracks = [{'artist': f"Beyoncé {i} feat. Jay-Z", 'title': f"Crazy In Love {i} (Remastered)"} for i in range(8)]
+    assert all(len(main.plan_queries(track['artist'], track['title'])) >= 4 for track in tracks)
+
+    results = run_searches(tracks, main.search_track, 4)
+
+    assert results == [None] * len(tracks)
+    assert slskd.total >= 4 * len(tracks)
+    assert slskd.peak == 4
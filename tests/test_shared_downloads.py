@@ -0,0 +1,81 @@
+import os
+import time
+import threading
+
+from mutagen.id3 import ID3, TALB, TIT2, TPE1
+
+import main
+from shared_downloads import SharedDownloads
+
+# Silent MPEG-1 Layer III frames, enough for mutagen to open the file as an MP3
+MP3_FRAME = b'\xff\xfb\x90\x00' + b'\x00' * 413
+
+def make_mp3(path, artist, title, album):
+    with open(path, 'wb') as f:
+        f.write(MP3_FRAME * 20)
+    tags = ID3()
+    tags.add(TPE1(encoding=3, text=artist))
+    tags.add(TIT2(encoding=3, text=title))
+    tags.add(TALB(encoding=3, text=album))
+    tags.save(path)
+
+def subscribe_while_searching(shared, key, search_result):
+    """Owner search that lets a second job subscribe before it returns; returns (owner result, subscriber result)"""
+    searching = threading.Event()
+    finish = threading.Event()
+    subscriber_result = {}
+
+    def search():
+        searching.set()
+        finish.wait(5)
+        return search_result
+
+    def subscriber():
+        searching.wait(5)
+        subscriber_result['download'] = shared.acquire(key, lambda: {'unexpected': 'second search'})
+
+    thread = threading.Thread(target=subscriber)
+    thread.start()
+    owner = threading.Thread(target=lambda: subscriber_result.setdefault('owner', shared.acquire(key, search)))
+    owner.start()
+    searching.wait(5)
+    # Give the subscriber time to join the entry before the owner's search returns
+    while not shared.entries.get(key) or not shared.entries[key].subscribers:
+        time.sleep(0.001)
+    finish.set()
+    owner.join(5)
+    thread.join(5)
+    return subscriber_result['owner'], subscriber_result['download']
+
+def test_subscriber_gets_nothing_when_the_owner_search_misses(tmp_path):
+    shared = SharedDownloads(str(tmp_path / "shared"))
+
+    owner, subscriber = subscribe_while_searching(shared, "a - one", None)
+
+    assert owner is None
+    assert subscriber is None
+    assert shared.entries == {}
+
+def test_handoff_is_not_changed_by_the_owner_daily_tag_rewrite(tmp_path):
+    shared = SharedDownloads(str(tmp_path / "shared"))
+    download = {'artist': "A", 'title': "One"}
+    owner, subscriber = subscribe_while_searching(shared, "a - one", download)
+    assert owner is download
+    subscription = subscriber['subscription']
+
+    downloaded = tmp_path / "A - One (raw).mp3"
+    make_mp3(str(downloaded), "A", "One", "Original Album")
+    shared.deliver("a - one", str(downloaded))
+    shared.release("a - one")
+    handoff = subscription.wait(5)
+    assert handoff and os.path.exists(handoff)
+
+    # The owner moves its file into Daily (a hard link on one filesystem) and normalizes its tags
+    daily = tmp_path / "A - One.mp3"
+    main.place_file(str(downloaded), str(daily))
+    main.rewrite_daily_tags(str(daily), main.desired_daily_tags(daily.name))
+    assert str(ID3(str(daily))['TALB']) == "Daily Mix"
+
+    assert str(ID3(handoff)['TALB']) == "Original Album"
+    subscription.cleanup()
+    assert not os.path.exists(os.path.dirname(handoff))
@@ -0,0 +1,54 @@
+import main
+from candidate_ranking import Candidate
+from transfer_tracker import track_transfers
+
+def make_download(alternates):
+    candidate = Candidate(90.0, "slow-peer", "@@music\\A\\A - One.mp3", 8000000, 320, 5, 100000)
+    return {'artist': "A", 'title': "One", 'candidate': candidate, 'alternates': alternates, 'retries': 0}
+
+def slskd_listing(*transfers):
+    """GET /transfers/downloads for (username, filename, state, bytes) tuples"""
+    return [{'username': username, 'directories': [{'files': [
+        {'id': f"{username}-1", 'filename': filename, 'state': state, 'bytesTransferred': done}]}]}
+        for username, filename, state, done in transfers]
+
+def test_a_stalled_transfer_without_alternates_is_left_to_finish(monkeypatch):
+    cancelled = []
+    monkeypatch.setattr(main, "cancel_transfer", lambda username, transfer: cancelled.append(username))
+    download = make_download(alternates=[])
+    filename = download['candidate'].filename
+
+    # Queued remotely with nothing moving over several stall windows, then the peer gets to it
+    polls = iter([("Queued, Remotely", 0)] * 6 + [("Completed, Succeeded", 8000000)])
+    def fetch_downloads():
+        state, done = next(polls)
+        return slskd_listing(("slow-peer", filename, state, done))
+
+    finished = []
+    result = track_transfers([download], fetch_downloads, finished.append, timeout=5, interval=0.01,
+                             failover=main.failover_download, stall_window=0.02)
+
+    assert cancelled == []
+    assert result['succeeded'] == finished == [download] and result['failed'] == []
+
+def test_a_stalled_transfer_is_only_cancelled_once_its_replacement_is_queued(monkeypatch):
+    events = []
+    monkeypatch.setattr(main, "cancel_transfer", lambda username, transfer: events.append(("cancel", username)))
+    monkeypatch.setattr(main, "queue_download", lambda candidate: events.append(("queue", candidate.username)) or True)
+    same_peer = Candidate(80.0, "slow-peer", "@@music\\A - One.flac", 30000000, 0, 0, 100000)
+    other_peer = Candidate(70.0, "fast-peer", "@@other\\A - One.mp3", 8000000, 320, 0, 900000)
+    download = make_download(alternates=[same_peer, other_peer])
+
+    assert main.failover_download(download, {'id': "slow-peer-1"})
+    assert events == [("queue", "fast-peer"), ("cancel", "slow-peer")]
+    assert download['candidate'] is other_peer and download['retries'] == 1
+
+def test_a_failed_transfer_without_alternates_is_given_up(monkeypatch):
+    monkeypatch.setattr(main, "cancel_transfer", lambda username, transfer: None)
+    download = make_download(alternates=[])
+    fetch_downloads = lambda: slskd_listing(("slow-peer", download['candidate'].filename, "Completed, Errored", 0))
+
+    result = track_transfers([download], fetch_downloads, lambda download: None, timeout=5, interval=0.01,
+                             failover=main.failover_download, stall_window=0.02)
+
+    assert result['failed'] == [download] and result['pending'] == []
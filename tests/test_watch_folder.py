@@ -0,0 +1,83 @@
+import os
+import time
+import threading
+
+import pytest
+
+import main
+from job_journal import JobJournal
+from watch_folder import WatchFolder
+
+def test_the_startup_sweep_only_queues_playlist_files(tmp_path, monkeypatch):
+    for name in ("a.txt", "b.m3u", "c.m3u8", "done.txt.processed", "cover.jpg", ".DS_Store", ".a.txt.swp"):
+        (tmp_path / name).write_text("x")
+    monkeypatch.setattr(main, "WATCH_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "swept_watch_files", {})
+    submitted = []
+    monkeypatch.setattr(main, "submit_watch_file", submitted.append)
+
+    main.process_watch_folder()
+
+    assert submitted == ["a.txt", "b.m3u", "c.m3u8"]
+    assert sorted(main.swept_watch_files) == submitted
+
+class RecordingWatcher:
+    def __init__(self):
+        self.retries = []
+
+    def retry(self, path, delay):
+        self.retries.append((os.path.basename(path), delay))
+
+@pytest.fixture
+def watch_dir(tmp_path, monkeypatch):
+    path = tmp_path / "watch"
+    path.mkdir()
+    monkeypatch.setattr(main, "WATCH_DIR", str(path))
+    monkeypatch.setattr(main, "WATCH_POLL_INTERVAL", 10.0)
+    monkeypatch.setattr(main, "watch_failures", {})
+    monkeypatch.setattr(main, "swept_watch_files", {})
+    monkeypatch.setattr(main, "watcher", RecordingWatcher())
+    journal = JobJournal(str(tmp_path / "journal.db"))
+    monkeypatch.setattr(main, "journal", journal)
+    yield path
+    journal.close()
+
+def test_a_playlist_spotify_failed_to_fetch_is_retried_with_back_off(watch_dir, monkeypatch):
+    (watch_dir / "mix.txt").write_text("https://open.spotify.com/playlist/one\nhttps://open.spotify.com/playlist/two\n")
+    main.swept_watch_files["mix.txt"] = main.watch_file_fingerprint(str(watch_dir / "mix.txt"))
+    track = {'artist': "A", 'title': "One"}
+    monkeypatch.setattr(main, "fetch_playlists", lambda links: {links[0]: [track], links[1]: []})
+
+    main.process_watch_file("mix.txt")
+    main.process_watch_file("mix.txt")
+
+    assert main.watcher.retries == [("mix.txt", 10.0), ("mix.txt", 20.0)]
+    assert (watch_dir / "mix.txt").exists()
+    # The watcher's retry report must not be mistaken for the sweep's file
+    assert "mix.txt" not in main.swept_watch_files
+
+    # Spotify is back: the playlist goes through and the back-off starts over
+    downloaded = []
+    monkeypatch.setattr(main, "fetch_playlists", lambda links: {link: [track] for link in links})
+    monkeypatch.setattr(main, "download_watch_tracks", lambda run_id, resumed, destination_dir: downloaded.append(run_id))
+    monkeypatch.setattr(main, "DOWNLOADS_ROOT", str(watch_dir.parent / "downloads"))
+    main.process_watch_file("mix.txt")
+
+    assert len(downloaded) == 1
+    assert (watch_dir / "mix.txt.processed").exists()
+    assert main.watch_failures == {}
+
+@pytest.mark.parametrize("mode", ["auto", "poll"])
+def test_a_retry_wakes_up_a_waiting_watcher(tmp_path, mode):
+    path = tmp_path / "mix.txt"
+    path.write_text("x")
+    watcher = WatchFolder(str(tmp_path), (".txt",), debounce=0.0, poll_interval=0.05, mode=mode)
+    # Whatever is reported first (the poll sees the existing file); afterwards the folder is quiet
+    watcher.wait(0.2)
+    assert watcher.wait(0.1) == []
+
+    threading.Timer(0.1, watcher.retry, args=(str(path), 0.1)).start()
+    watcher.retry(str(tmp_path / "gone.txt"), 0.0)
+    started = time.monotonic()
+    assert watcher.wait(10) == [str(path)]
+    assert time.monotonic() - started < 2